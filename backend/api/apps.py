@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     name = "api"
+
+    def ready(self):
+        from api import signals  # noqa: F401
+        from api.shopping_list import register_fonts
+
+        register_fonts()
@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from api.cache import get_token_key
+
+User = get_user_model()
+
+# Без пароля и счётчиков: save() пользователя из кэша не перезапишет
+# счётчики, которые меняются через UPDATE.
+AUTH_FIELDS = {
+    "id",
+    "username",
+    "email",
+    "first_name",
+    "last_name",
+    "is_active",
+    "is_staff",
+    "is_superuser",
+}
+# Model.from_db ждёт значения в порядке полей модели.
+CACHED_USER_FIELDS = tuple(
+    field.attname
+    for field in User._meta.concrete_fields
+    if field.attname in AUTH_FIELDS
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Аутентификация по токену с кэшированием пользователя."""
+
+    def authenticate_credentials(self, key):
+        cache_key = get_token_key(key)
+        values = cache.get(cache_key)
+        if values is None:
+            user, _ = super().authenticate_credentials(key)
+            values = [getattr(user, field) for field in CACHED_USER_FIELDS]
+            cache.set(cache_key, values, settings.TOKEN_CACHE_TIMEOUT)
+        user = User.from_db(
+            router.db_for_read(User), CACHED_USER_FIELDS, values
+        )
+        return user, Token(key=key, user=user)
@@ -0,0 +1,88 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+
+CONTENT_VERSION_KEY = "content_version"
+INGREDIENT_VERSION_KEY = "ingredient_version"
+
+
+def get_membership_key(model, user_id):
+    return f"membership:{model._meta.model_name}:{user_id}"
+
+
+def get_recipe_ids(model, user):
+    """Множество id рецептов в избранном или списке покупок пользователя."""
+    key = get_membership_key(model, user.id)
+    recipe_ids = cache.get(key)
+    if recipe_ids is None:
+        recipe_ids = set(
+            model.objects.filter(user=user).values_list(
+                "recipe_id", flat=True
+            )
+        )
+        cache.set(key, recipe_ids, settings.MEMBERSHIP_CACHE_TIMEOUT)
+    return recipe_ids
+
+
+def reset_recipe_ids(model, user):
+    cache.delete(get_membership_key(model, user.id))
+
+
+def get_author_ids(model, user):
+    """Множество id авторов, на которых подписан пользователь."""
+    key = get_membership_key(model, user.id)
+    author_ids = cache.get(key)
+    if author_ids is None:
+        author_ids = set(
+            model.objects.filter(user=user).values_list(
+                "author_id", flat=True
+            )
+        )
+        cache.set(key, author_ids, settings.MEMBERSHIP_CACHE_TIMEOUT)
+    return author_ids
+
+
+def get_token_key(key):
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f"auth_token:{digest}"
+
+
+def reset_token(key):
+    cache.delete(get_token_key(key))
+
+
+def get_content_version(key=CONTENT_VERSION_KEY):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_content_version(key=CONTENT_VERSION_KEY):
+    """Делает недействительными данные, закэшированные с этой версией."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def get_response_key(request):
+    """Ключ ответа по адресу и отсортированным параметрам запроса."""
+    query = urlencode(
+        [
+            (name, sorted(values))
+            for name, values in sorted(request.query_params.lists())
+        ],
+        doseq=True,
+    )
+    url = f"{request.build_absolute_uri(request.path)}?{query}"
+    digest = hashlib.sha256(url.encode()).hexdigest()
+    return f"response:{get_content_version()}:{digest}"
+
+
+def reset_author_ids(model, user):
+    cache.delete(get_membership_key(model, user.id))
@@ -0,0 +1,44 @@
+from django.conf import settings
+
+from recipes.models import FeedEntry, Recipe
+from users.models import Follow
+
+
+def create_in_batches(entries):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= settings.FEED_BATCH_SIZE:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out_recipe(recipe):
+    """Добавляет новый рецепт в ленты подписчиков автора."""
+    follower_ids = (
+        Follow.objects.filter(author=recipe.author_id)
+        .values_list("user_id", flat=True)
+        .iterator(chunk_size=settings.FEED_BATCH_SIZE)
+    )
+    create_in_batches(
+        FeedEntry(user_id=user_id, recipe=recipe, pub_date=recipe.pub_date)
+        for user_id in follower_ids
+    )
+
+
+def backfill_feed(user, author):
+    """Заполняет ленту последними рецептами автора после подписки."""
+    recipes = Recipe.objects.filter(author=author).values_list(
+        "id", "pub_date"
+    )[: settings.FEED_BACKFILL_LIMIT]
+    create_in_batches(
+        FeedEntry(user=user, recipe_id=recipe_id, pub_date=pub_date)
+        for recipe_id, pub_date in recipes
+    )
+
+
+def prune_feed(user, author):
+    """Убирает рецепты автора из ленты после отписки."""
+    FeedEntry.objects.filter(user=user, recipe__author=author).delete()
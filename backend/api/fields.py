@@ -0,0 +1,35 @@
+from collections import Counter
+
+from rest_framework import serializers
+
+
+def get_objects_in_bulk(queryset, pk_list):
+    """Объекты по списку id одним запросом in_bulk()."""
+    duplicates = sorted(
+        pk for pk, count in Counter(pk_list).items() if count > 1
+    )
+    if duplicates:
+        raise serializers.ValidationError(f"Повторяющиеся id: {duplicates}.")
+    objects = queryset.in_bulk(pk_list)
+    missing = [pk for pk in pk_list if pk not in objects]
+    if missing:
+        raise serializers.ValidationError(f"Не найдены id: {missing}.")
+    return objects
+
+
+class BulkPrimaryKeyRelatedField(serializers.ListField):
+    """Список связанных объектов, проверяемый одним запросом."""
+
+    child = serializers.IntegerField(min_value=1)
+
+    def __init__(self, queryset, **kwargs):
+        self.queryset = queryset
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        pk_list = super().to_internal_value(data)
+        objects = get_objects_in_bulk(self.queryset, pk_list)
+        return [objects[pk] for pk in pk_list]
+
+    def to_representation(self, value):
+        return [obj.pk for obj in value.all()]
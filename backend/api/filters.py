@@ -1,26 +1,34 @@
+import re
+
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import BooleanField, Exists, FloatField, OuterRef
+from django.db.models.expressions import RawSQL
 from django_filters.rest_framework import FilterSet, filters
-from rest_framework.filters import SearchFilter
 
-from recipes.models import Ingredient, Recipe
+from recipes.models import Recipe, Tag
 
 User = get_user_model()
 
+SEARCH_TERM_RE = re.compile(r'\w+')
 
-class CustomIngredientFilter(SearchFilter):
-    """Фильтр ингредиента."""
-
-    search_param = "name"
+POSTGRESQL_QUERY = "plainto_tsquery('russian', %s)"
+POSTGRESQL_MATCH = f'recipes_recipe.search_vector @@ {POSTGRESQL_QUERY}'
+POSTGRESQL_RANK = f'ts_rank(recipes_recipe.search_vector, {POSTGRESQL_QUERY})'
 
-    class Meta:
-        model = Ingredient
-        fields = ("name",)
+SEARCH_ORDERING = ('-search_rank', '-pub_date', '-id')
 
 
 class CustomRecipeFilter(FilterSet):
     """Фильтр рецепта."""
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    tags = filters.ModelMultipleChoiceFilter(
+        field_name='tags__slug',
+        to_field_name='slug',
+        queryset=Tag.objects.all(),
+        method='filter_tags',
+    )
     author = filters.ModelChoiceFilter(queryset=User.objects.all())
+    search = filters.CharFilter(method='filter_search')
     is_favorited = filters.BooleanFilter(method='if_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='if_is_in_shopping_cart'
@@ -28,7 +36,58 @@ class CustomRecipeFilter(FilterSet):
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',)
+        fields = (
+            'tags',
+            'author',
+            'search',
+            'is_favorited',
+            'is_in_shopping_cart',
+        )
+
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(
+            Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe=OuterRef('pk'), tag__in=value
+                )
+            )
+        )
+
+    def filter_search(self, queryset, name, value):
+        """Полнотекстовый поиск по названию и тексту с ранжированием."""
+        if connection.vendor == 'postgresql':
+            return (
+                queryset.filter(
+                    RawSQL(
+                        POSTGRESQL_MATCH, [value], output_field=BooleanField()
+                    )
+                )
+                .annotate(
+                    search_rank=RawSQL(
+                        POSTGRESQL_RANK, [value], output_field=FloatField()
+                    )
+                )
+                .order_by(*SEARCH_ORDERING)
+            )
+        if connection.vendor == 'sqlite':
+            # FTS5 не знает русской морфологии, поэтому ищем по префиксам.
+            terms = SEARCH_TERM_RE.findall(value)
+            if not terms:
+                return queryset
+            # Подзапрос с rank выполнял бы MATCH для каждой строки,
+            # поэтому таблица FTS5 присоединяется к выборке.
+            return queryset.extra(
+                tables=['recipes_recipe_fts'],
+                where=[
+                    'recipes_recipe_fts.rowid = recipes_recipe.id',
+                    'recipes_recipe_fts MATCH %s',
+                ],
+                params=[' '.join(f'"{term}"*' for term in terms)],
+                select={'search_rank': '-recipes_recipe_fts.rank'},
+            ).order_by(*SEARCH_ORDERING)
+        return queryset.filter(name__icontains=value)
 
     def if_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
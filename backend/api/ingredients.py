@@ -0,0 +1,68 @@
+import threading
+import time
+from bisect import bisect_left
+from itertools import islice
+
+from django.conf import settings
+
+from api.cache import INGREDIENT_VERSION_KEY, get_content_version
+from recipes.models import Ingredient
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти воркера для поиска по названию."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.built_at = None
+        self.entries = ((), ())
+
+    def is_fresh(self, version):
+        return (
+            version == self.version
+            and time.monotonic() - self.built_at
+            < settings.INGREDIENT_INDEX_TIMEOUT
+        )
+
+    def refresh(self):
+        """Перестраивает индекс, если каталог изменился или индекс устарел."""
+        version = get_content_version(INGREDIENT_VERSION_KEY)
+        if self.is_fresh(version):
+            return
+        with self.lock:
+            if self.is_fresh(version):
+                return
+            ingredients = sorted(
+                Ingredient.objects.values("id", "name", "measurement_unit"),
+                key=lambda item: (item["name"].casefold(), item["id"]),
+            )
+            keys = tuple(item["name"].casefold() for item in ingredients)
+            self.entries = (keys, tuple(ingredients))
+            self.version = version
+            self.built_at = time.monotonic()
+
+    def search(self, query, limit):
+        """Совпадения по началу названия, затем по вхождению подстроки."""
+        self.refresh()
+        keys, items = self.entries
+        query = query.strip().casefold()
+        if not query:
+            return list(items)
+        start = bisect_left(keys, query)
+        end = start
+        while end < len(keys) and keys[end].startswith(query):
+            end += 1
+        stop = min(end, start + limit)
+        result = list(items[start:stop])
+        if len(result) < limit:
+            contains = (
+                item
+                for key, item in zip(keys, items)
+                if query in key and not key.startswith(query)
+            )
+            result += islice(contains, limit - len(result))
+        return result
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,314 @@
+import json
+import os
+import statistics
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.shopping_list import create_pdf_file
+from recipes.models import Ingredient, Recipe, ShoppingCart, Tag
+from users.models import User
+
+CART_SIZE = 200
+RENDER_LINES = (10, 100, 1000)
+# Сценарии, между итерациями которых кэш не очищается.
+WARM_CACHE_SCENARIOS = {"users_me_cached_token"}
+
+
+class Command(BaseCommand):
+    help = "Замер задержки, числа SQL-запросов и размера ответов API"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=3)
+        parser.add_argument(
+            "--output",
+            type=Path,
+            default=Path("bench_api.json"),
+            help="Файл для записи результатов",
+        )
+        parser.add_argument(
+            "--baseline",
+            type=Path,
+            help="Результаты прошлого запуска для сравнения",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.2,
+            help="Допустимый относительный рост p50",
+        )
+        parser.add_argument(
+            "--min-delta-ms",
+            type=float,
+            default=1.0,
+            help="Рост p50 меньше этого значения не считается регрессией",
+        )
+        parser.add_argument(
+            "--only",
+            nargs="*",
+            help="Названия сценариев, которые нужно запустить",
+        )
+
+    def get_scenarios(self):
+        user = (
+            User.objects.annotate(follows=Count("follower", distinct=True))
+            .filter(follows__gt=0, shopping_list__isnull=False)
+            .order_by("-follows")
+            .first()
+        )
+        recipe = Recipe.objects.first()
+        if user is None or recipe is None:
+            raise CommandError(
+                "База пуста: сначала выполните manage.py seed_load."
+            )
+        tags = "&".join(
+            f"tags={slug}"
+            for slug in Tag.objects.values_list("slug", flat=True)[:2]
+        )
+        ingredient = Ingredient.objects.first().name[:2]
+        return {
+            "recipes_list": ("get", "/api/recipes/", None),
+            "recipes_list_auth": ("get", "/api/recipes/", user),
+            "recipes_list_tags": ("get", f"/api/recipes/?{tags}", None),
+            "recipes_list_author": (
+                "get",
+                f"/api/recipes/?author={recipe.author_id}",
+                None,
+            ),
+            "recipes_list_favorited": (
+                "get",
+                "/api/recipes/?is_favorited=1",
+                user,
+            ),
+            "recipes_list_in_shopping_cart": (
+                "get",
+                "/api/recipes/?is_in_shopping_cart=1",
+                user,
+            ),
+            "recipes_list_cursor": ("get", "/api/recipes/?cursor=", None),
+            "recipe_detail": ("get", f"/api/recipes/{recipe.id}/", user),
+            "users_me": ("get", "/api/users/me/", user),
+            "users_me_cached_token": ("get", "/api/users/me/", user),
+            "subscriptions": (
+                "get",
+                "/api/users/subscriptions/?recipes_limit=3",
+                user,
+            ),
+            "ingredients_search": (
+                "get",
+                f"/api/ingredients/?name={ingredient}",
+                None,
+            ),
+            "favorite_post": (
+                "post",
+                f"/api/recipes/{recipe.id}/favorite/",
+                user,
+            ),
+            "shopping_cart_post": (
+                "post",
+                f"/api/recipes/{recipe.id}/shopping_cart/",
+                user,
+            ),
+            "download_shopping_cart": (
+                "get",
+                "/api/recipes/download_shopping_cart/",
+                user,
+            ),
+            "download_shopping_cart_200": (
+                "get",
+                "/api/recipes/download_shopping_cart/",
+                lambda: self.create_cart_user(CART_SIZE),
+            ),
+        }
+
+    @staticmethod
+    def create_cart_user(size):
+        """Пользователь с size рецептами в списке покупок."""
+        user = User.objects.create(
+            username="bench_cart",
+            email="bench_cart@example.com",
+            first_name="Bench",
+            last_name="Cart",
+        )
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=user, recipe_id=recipe_id)
+            for recipe_id in Recipe.objects.order_by("id").values_list(
+                "id", flat=True
+            )[:size]
+        )
+        return user
+
+    @staticmethod
+    def request(client, method, url):
+        response = getattr(client, method)(url)
+        if response.streaming:
+            size = sum(len(chunk) for chunk in response.streaming_content)
+        else:
+            size = len(response.content)
+        return response.status_code, size
+
+    def measure(self, method, url, user, iterations, warmup, clear_cache):
+        client = APIClient()
+        if user is not None:
+            # Настоящий токен, чтобы в замер входила аутентификация.
+            token, _ = Token.objects.get_or_create(user=user)
+            client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        timings = []
+        for i in range(warmup + iterations):
+            if clear_cache:
+                # Иначе анонимные сценарии измеряли бы попадания в кэш.
+                cache.clear()
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    status, size = self.request(client, method, url)
+                    elapsed = (time.perf_counter() - started) * 1000
+                transaction.set_rollback(True)
+            if i >= warmup:
+                timings.append(elapsed)
+        return self.summarize(timings, status, len(queries), size)
+
+    def measure_render(self, lines, iterations, warmup):
+        """Время отрисовки PDF без запросов к базе и HTTP."""
+        items = [
+            {
+                "ingredient__name": f"Ингредиент {number}",
+                "ingredient__measurement_unit": "г",
+                "total_amount": number,
+            }
+            for number in range(1, lines + 1)
+        ]
+        timings = []
+        for i in range(warmup + iterations):
+            started = time.perf_counter()
+            with create_pdf_file(items) as file:
+                elapsed = (time.perf_counter() - started) * 1000
+                size = file.seek(0, os.SEEK_END)
+            if i >= warmup:
+                timings.append(elapsed)
+        return self.summarize(timings, "pdf", 0, size)
+
+    @staticmethod
+    def summarize(timings, status, queries, size):
+        percentiles = statistics.quantiles(
+            timings, n=100, method="inclusive"
+        )
+        return {
+            "status": status,
+            "p50_ms": round(statistics.median(timings), 2),
+            "p95_ms": round(percentiles[94], 2),
+            "p99_ms": round(percentiles[98], 2),
+            "mean_ms": round(statistics.fmean(timings), 2),
+            "queries": queries,
+            "bytes": size,
+        }
+
+    def write_result(self, name, result):
+        self.stdout.write(
+            f"{name:32} {result['status']} "
+            f"p50={result['p50_ms']:>8} "
+            f"p99={result['p99_ms']:>8} мс "
+            f"запросов={result['queries']:>3} "
+            f"байт={result['bytes']}"
+        )
+
+    @staticmethod
+    def find_regressions(results, baseline, threshold, min_delta):
+        regressions = []
+        for name, result in results.items():
+            previous = baseline.get(name)
+            if previous is None:
+                continue
+            delta = result["p50_ms"] - previous["p50_ms"]
+            if delta > max(previous["p50_ms"] * threshold, min_delta):
+                regressions.append(
+                    f"{name}: p50 {previous['p50_ms']} -> "
+                    f"{result['p50_ms']} мс"
+                )
+            if result["queries"] > previous["queries"]:
+                regressions.append(
+                    f"{name}: запросов {previous['queries']} -> "
+                    f"{result['queries']}"
+                )
+        return regressions
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 2:
+            raise CommandError(
+                "Для перцентилей нужно --iterations не меньше 2."
+            )
+        setup_test_environment()
+        scenarios = self.get_scenarios()
+        renders = {f"pdf_render_{lines}": lines for lines in RENDER_LINES}
+        if options["only"]:
+            scenarios = {
+                name: scenario
+                for name, scenario in scenarios.items()
+                if name in options["only"]
+            }
+            renders = {
+                name: lines
+                for name, lines in renders.items()
+                if name in options["only"]
+            }
+        results = {}
+        for name, (method, url, user) in scenarios.items():
+            # Данные, подготовленные для сценария, откатываются после него.
+            with transaction.atomic():
+                if callable(user):
+                    user = user()
+                results[name] = self.measure(
+                    method,
+                    url,
+                    user,
+                    options["iterations"],
+                    options["warmup"],
+                    clear_cache=name not in WARM_CACHE_SCENARIOS,
+                )
+                transaction.set_rollback(True)
+            self.write_result(name, results[name])
+        for name, lines in renders.items():
+            results[name] = self.measure_render(
+                lines, options["iterations"], options["warmup"]
+            )
+            self.write_result(name, results[name])
+
+        options["output"].write_text(
+            json.dumps(
+                {
+                    "created": datetime.now(timezone.utc).isoformat(),
+                    "database": connection.vendor,
+                    "iterations": options["iterations"],
+                    "scenarios": results,
+                },
+                ensure_ascii=False,
+                indent=2,
+            ),
+            encoding="utf-8",
+        )
+        self.stdout.write(f"Результаты записаны в {options['output']}")
+
+        if options["baseline"]:
+            baseline = json.loads(
+                options["baseline"].read_text(encoding="utf-8")
+            )["scenarios"]
+            regressions = self.find_regressions(
+                results,
+                baseline,
+                options["threshold"],
+                options["min_delta_ms"],
+            )
+            if regressions:
+                raise CommandError(
+                    "Обнаружены регрессии:\n" + "\n".join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS("Регрессий нет"))
@@ -0,0 +1,190 @@
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+DURATION_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def new_histogram():
+    return {"buckets": [0] * len(DURATION_BUCKETS), "sum": 0.0, "count": 0}
+
+
+class MetricsRegistry:
+    """Счётчики запросов процесса с периодическим сбросом в файл."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.durations = defaultdict(new_histogram)
+        self.responses = defaultdict(int)
+        self.queries = defaultdict(int)
+        self.cache_requests = defaultdict(int)
+        self.flushed_at = time.monotonic()
+
+    def record(self, view, status, duration, queries):
+        index = bisect.bisect_left(DURATION_BUCKETS, duration)
+        with self.lock:
+            histogram = self.durations[view]
+            if index < len(DURATION_BUCKETS):
+                histogram["buckets"][index] += 1
+            histogram["sum"] += duration
+            histogram["count"] += 1
+            self.responses[(view, status)] += 1
+            self.queries[view] += queries
+            now = time.monotonic()
+            # Сброс забирает один поток, остальные продолжают без записи.
+            flush = now - self.flushed_at >= settings.METRICS_FLUSH_INTERVAL
+            if flush:
+                self.flushed_at = now
+        if flush:
+            self.flush()
+
+    def record_cache(self, view, hit):
+        with self.lock:
+            self.cache_requests[(view, "hit" if hit else "miss")] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "durations": {
+                    view: {
+                        "buckets": list(histogram["buckets"]),
+                        "sum": histogram["sum"],
+                        "count": histogram["count"],
+                    }
+                    for view, histogram in self.durations.items()
+                },
+                "responses": [
+                    [view, status, count]
+                    for (view, status), count in self.responses.items()
+                ],
+                "queries": dict(self.queries),
+                "cache": [
+                    [view, result, count]
+                    for (view, result), count in self.cache_requests.items()
+                ],
+            }
+
+    def flush(self):
+        with self.lock:
+            self.flushed_at = time.monotonic()
+        if not settings.METRICS_DIR:
+            return
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        path = os.path.join(
+            settings.METRICS_DIR, f"metrics.{os.getpid()}.json"
+        )
+        temporary_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary_path, "w") as file:
+            json.dump(self.snapshot(), file)
+        os.replace(temporary_path, path)
+
+
+registry = MetricsRegistry()
+
+
+def load_snapshots():
+    """Снимки всех воркеров; без METRICS_DIR — только текущего процесса."""
+    if not settings.METRICS_DIR:
+        return [registry.snapshot()]
+    registry.flush()
+    snapshots = []
+    pattern = os.path.join(settings.METRICS_DIR, "metrics.*.json")
+    for path in glob.glob(pattern):
+        try:
+            with open(path) as file:
+                snapshots.append(json.load(file))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def merge_snapshots(snapshots):
+    durations = defaultdict(new_histogram)
+    responses = defaultdict(int)
+    queries = defaultdict(int)
+    cache_requests = defaultdict(int)
+    for snapshot in snapshots:
+        for view, histogram in snapshot["durations"].items():
+            total = durations[view]
+            for index, count in enumerate(histogram["buckets"]):
+                total["buckets"][index] += count
+            total["sum"] += histogram["sum"]
+            total["count"] += histogram["count"]
+        for view, status, count in snapshot["responses"]:
+            responses[(view, status)] += count
+        for view, count in snapshot["queries"].items():
+            queries[view] += count
+        for view, result, count in snapshot.get("cache", ()):
+            cache_requests[(view, result)] += count
+    return durations, responses, queries, cache_requests
+
+
+def render_metrics():
+    """Метрики всех воркеров в текстовом формате Prometheus."""
+    durations, responses, queries, cache_requests = merge_snapshots(
+        load_snapshots()
+    )
+    lines = [
+        "# HELP foodgram_http_request_duration_seconds "
+        "Длительность обработки запроса.",
+        "# TYPE foodgram_http_request_duration_seconds histogram",
+    ]
+    for view, histogram in sorted(durations.items()):
+        cumulative = 0
+        for bound, count in zip(DURATION_BUCKETS, histogram["buckets"]):
+            cumulative += count
+            lines.append(
+                "foodgram_http_request_duration_seconds_bucket"
+                f'{{view="{view}",le="{bound}"}} {cumulative}'
+            )
+        lines += [
+            "foodgram_http_request_duration_seconds_bucket"
+            f'{{view="{view}",le="+Inf"}} {histogram["count"]}',
+            "foodgram_http_request_duration_seconds_sum"
+            f'{{view="{view}"}} {histogram["sum"]}',
+            "foodgram_http_request_duration_seconds_count"
+            f'{{view="{view}"}} {histogram["count"]}',
+        ]
+    lines += [
+        "# HELP foodgram_http_responses_total Ответы по коду статуса.",
+        "# TYPE foodgram_http_responses_total counter",
+    ]
+    for (view, status), count in sorted(responses.items()):
+        lines.append(
+            f'foodgram_http_responses_total{{view="{view}",'
+            f'status="{status}"}} {count}'
+        )
+    lines += [
+        "# HELP foodgram_db_queries_total SQL-запросы при обработке.",
+        "# TYPE foodgram_db_queries_total counter",
+    ]
+    for view, count in sorted(queries.items()):
+        lines.append(f'foodgram_db_queries_total{{view="{view}"}} {count}')
+    lines += [
+        "# HELP foodgram_response_cache_total Обращения к кэшу ответов.",
+        "# TYPE foodgram_response_cache_total counter",
+    ]
+    for (view, result), count in sorted(cache_requests.items()):
+        lines.append(
+            f'foodgram_response_cache_total{{view="{view}",'
+            f'result="{result}"}} {count}'
+        )
+    return "\n".join(lines) + "\n"
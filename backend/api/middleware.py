@@ -0,0 +1,222 @@
+import cProfile
+import io
+import itertools
+import json
+import logging
+import os
+import pstats
+import re
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+from rest_framework.exceptions import APIException
+from rest_framework.settings import api_settings
+
+from api.metrics import registry
+
+slow_request_logger = logging.getLogger("api.slow_requests")
+
+IN_LIST_RE = re.compile(r"IN \((?:%s, )*%s\)")
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r"\b\d+\b")
+
+DUPLICATES_LIMIT = 5
+
+PROFILE_PARAM = "profile"
+PROFILE_HEADER = "HTTP_X_PROFILE"
+PROFILE_STATS_LIMIT = 50
+
+
+def get_fingerprint(sql):
+    """Нормализованный текст SQL без значений параметров."""
+    sql = IN_LIST_RE.sub("IN (...)", sql)
+    sql = STRING_RE.sub("?", sql)
+    return NUMBER_RE.sub("?", sql)
+
+
+def get_view_name(request):
+    """Имя представления и действия, например RecipeViewSet.list."""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved"
+    view_class = getattr(match.func, "cls", None)
+    if view_class is None:
+        return getattr(match.func, "__name__", match.view_name)
+    method = request.method.lower()
+    actions = getattr(match.func, "actions", None) or {}
+    return f"{view_class.__name__}.{actions.get(method, method)}"
+
+
+class QueryStats:
+    """Количество и длительность SQL-запросов одного HTTP-запроса."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.statements[sql] += 1
+
+    def get_duplicates(self):
+        fingerprints = Counter()
+        for sql, count in self.statements.items():
+            fingerprints[get_fingerprint(sql)] += count
+        return [
+            {"sql": sql, "count": count}
+            for sql, count in fingerprints.most_common(DUPLICATES_LIMIT)
+            if count > 1
+        ]
+
+
+class SQLInstrumentationMiddleware:
+    """Заголовок Server-Timing и журнал медленных запросов."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold = settings.SLOW_REQUEST_THRESHOLD_MS / 1000
+
+    def __call__(self, request):
+        stats = QueryStats()
+        start = time.perf_counter()
+        with connection.execute_wrapper(stats):
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+        request.sql_count = stats.count
+        request.sql_duration = stats.duration
+        timing = (
+            f'db;dur={stats.duration * 1000:.2f};desc="{stats.count}", '
+            f"app;dur={duration * 1000:.2f}"
+        )
+        if response.has_header("Server-Timing"):
+            timing = f'{response["Server-Timing"]}, {timing}'
+        response["Server-Timing"] = timing
+        if duration >= self.threshold:
+            self.log_slow_request(request, response, duration, stats)
+        return response
+
+    @staticmethod
+    def log_slow_request(request, response, duration, stats):
+        slow_request_logger.warning(
+            json.dumps(
+                {
+                    "method": request.method,
+                    "path": request.get_full_path(),
+                    "status": response.status_code,
+                    "duration_ms": round(duration * 1000, 2),
+                    "db_ms": round(stats.duration * 1000, 2),
+                    "queries": stats.count,
+                    "duplicates": stats.get_duplicates(),
+                },
+                ensure_ascii=False,
+            )
+        )
+
+
+class MetricsMiddleware:
+    """Длительность, статусы и число SQL-запросов по представлениям."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        registry.record(
+            get_view_name(request),
+            response.status_code,
+            time.perf_counter() - start,
+            getattr(request, "sql_count", 0),
+        )
+        return response
+
+
+class ProfilerMiddleware:
+    """Профилирование запросов через cProfile по флагу или выборочно."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.directory = settings.PROFILER_DIR
+        self.sample_rate = settings.PROFILER_SAMPLE_RATE
+        self.requests = itertools.count(1)
+        self.lock = threading.Lock()
+        self.sampled = {}
+
+    def __call__(self, request):
+        requested = self.is_requested(request)
+        sampled = (
+            not requested
+            and self.directory
+            and self.sample_rate
+            and next(self.requests) % self.sample_rate == 0
+        )
+        if not (requested or sampled):
+            return self.get_response(request)
+        # cProfile не допускает одновременной работы двух профилировщиков.
+        if not self.lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            profiler = cProfile.Profile()
+            response = profiler.runcall(self.get_response, request)
+            view_name = get_view_name(request)
+            if sampled:
+                self.aggregate(view_name, profiler)
+                return response
+            return self.report(view_name, profiler, response)
+        finally:
+            self.lock.release()
+
+    def is_requested(self, request):
+        if (
+            PROFILE_PARAM not in request.GET
+            and PROFILE_HEADER not in request.META
+        ):
+            return False
+        user = getattr(request, "user", None)
+        if user is not None and user.is_staff:
+            return True
+        # Токен проверяется здесь только для запросов с флагом профилирования.
+        for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+            try:
+                result = authenticator().authenticate(request)
+            except APIException:
+                return False
+            if result is not None:
+                return result[0].is_staff
+        return False
+
+    def dump(self, stats, filename):
+        os.makedirs(self.directory, exist_ok=True)
+        stats.dump_stats(os.path.join(self.directory, filename))
+
+    def aggregate(self, view_name, profiler):
+        stats = self.sampled.get(view_name)
+        if stats is None:
+            stats = self.sampled[view_name] = pstats.Stats(profiler)
+        else:
+            stats.add(profiler)
+        self.dump(stats, f"{view_name}.{os.getpid()}.sampled.prof")
+
+    def report(self, view_name, profiler, response):
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE)
+        if self.directory:
+            filename = f"{view_name}.{time.time_ns()}.prof"
+            self.dump(stats, filename)
+            response["X-Profile-File"] = filename
+            return response
+        stats.print_stats(PROFILE_STATS_LIMIT)
+        return HttpResponse(
+            stream.getvalue(), content_type="text/plain; charset=utf-8"
+        )
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+from api.cache import get_response_key
+from api.metrics import registry
+
+
+class AnonymousCacheMixin:
+    """Кэш данных ответов list и retrieve для анонимных пользователей."""
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        if not request.user.is_anonymous:
+            return handler(request, *args, **kwargs)
+        key = get_response_key(request)
+        data = cache.get(key)
+        registry.record_cache(type(self).__name__, data is not None)
+        if data is not None:
+            return Response(data)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+        return response
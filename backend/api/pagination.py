@@ -1,7 +1,21 @@
 from django.conf import settings
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class CustomPaginator(PageNumberPagination):
     page_size = settings.PAGINATION
     page_size_query_param = "limit"
+
+
+class RecipeCursorPaginator(CursorPagination):
+    """Пагинация по курсору без подсчёта общего числа записей."""
+
+    page_size = settings.PAGINATION
+    page_size_query_param = "limit"
+    ordering = ("-pub_date", "-id")
+
+
+class FeedCursorPaginator(RecipeCursorPaginator):
+    """Курсорная пагинация ленты подписок."""
+
+    ordering = ("-pub_date", "-recipe_id")
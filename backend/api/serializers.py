@@ -1,9 +1,11 @@
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers, status
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import SerializerMethodField
 
+from api.fields import BulkPrimaryKeyRelatedField, get_objects_in_bulk
 from users.models import Follow, User
 from recipes.models import (
     Favorite,
@@ -49,7 +51,7 @@ class CreateUserSerializer(UserCreateSerializer):
 class ShowSubscriptionsSerializer(UserSerializer):
     """Сериализатор подписок."""
     recipes = SerializerMethodField()
-    recipes_count = SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField()
 
     class Meta:
         model = User
@@ -80,14 +82,11 @@ class ShowSubscriptionsSerializer(UserSerializer):
             )
         return data
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
     def get_recipes(self, obj):
         request = self.context.get('request')
-        recipes_limit = request.GET.get('recipes_limit')
+        recipes_limit = request.GET.get('recipes_limit', '')
         recipes = obj.recipes.all()
-        if recipes_limit:
+        if recipes_limit.isdigit():
             recipes = recipes[:int(recipes_limit)]
         serializer = DemoRecipeSerializer(recipes, many=True, read_only=True)
         return serializer.data
@@ -118,10 +117,21 @@ class IngredientSerializer(serializers.ModelSerializer):
         )
 
 
+class IngredientRecipeListSerializer(serializers.ListSerializer):
+    """Проверяет все id ингредиентов рецепта одним запросом."""
+
+    def validate(self, attrs):
+        get_objects_in_bulk(
+            Ingredient.objects.all(),
+            [item["ingredient_id"] for item in attrs],
+        )
+        return attrs
+
+
 class IngredientRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор связи ингредиентов с рецептом."""
 
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField(source="ingredient_id", min_value=1)
     name = serializers.ReadOnlyField(source="ingredient.name")
     measurement_unit = serializers.ReadOnlyField(
         source="ingredient.measurement_unit"
@@ -135,6 +145,7 @@ class IngredientRecipeSerializer(serializers.ModelSerializer):
             "measurement_unit",
             "amount",
         )
+        list_serializer_class = IngredientRecipeListSerializer
 
 
 class ShowRecipeSerializer(serializers.ModelSerializer):
@@ -145,8 +156,8 @@ class ShowRecipeSerializer(serializers.ModelSerializer):
     ingredients = IngredientRecipeSerializer(
         many=True, source="ingredient_amount"
     )
-    is_favorited = serializers.BooleanField(default=False)
-    is_in_shopping_cart = serializers.BooleanField(default=False)
+    is_favorited = SerializerMethodField()
+    is_in_shopping_cart = SerializerMethodField()
     image = Base64ImageField()
 
     class Meta:
@@ -164,14 +175,24 @@ class ShowRecipeSerializer(serializers.ModelSerializer):
             "is_in_shopping_cart",
         )
 
+    def to_representation(self, instance):
+        instance.author.is_subscribed = instance.author_id in self.context.get(
+            "subscribed_author_ids", ()
+        )
+        return super().to_representation(instance)
+
+    def get_is_favorited(self, obj):
+        return obj.id in self.context.get("favorited_ids", ())
+
+    def get_is_in_shopping_cart(self, obj):
+        return obj.id in self.context.get("in_shopping_cart_ids", ())
+
 
 class CreateRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор создания рецепта."""
 
     ingredients = IngredientRecipeSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True, queryset=Tag.objects.all()
-    )
+    tags = BulkPrimaryKeyRelatedField(queryset=Tag.objects.all())
     image = Base64ImageField()
     author = UserSerializer(read_only=True)
 
@@ -194,7 +215,7 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         for ingredient_data in ingredients:
             ingredient_list.append(
                 IngredientRecipe(
-                    ingredient=ingredient_data.pop("id"),
+                    ingredient_id=ingredient_data.pop("ingredient_id"),
                     amount=ingredient_data.pop("amount"),
                     recipe=recipe,
                 )
@@ -210,18 +231,63 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         self.create_ingredients(recipe, ingredients)
         return recipe
 
+    @staticmethod
+    def update_tags(recipe, tags):
+        current_ids = set(recipe.tags.values_list("id", flat=True))
+        new_ids = {tag.id for tag in tags}
+        if current_ids - new_ids:
+            recipe.tags.remove(*(current_ids - new_ids))
+        if new_ids - current_ids:
+            recipe.tags.add(*(new_ids - current_ids))
+
+    @staticmethod
+    def update_ingredients(recipe, ingredients):
+        current = {
+            item.ingredient_id: item
+            for item in IngredientRecipe.objects.filter(recipe=recipe)
+        }
+        amounts = {
+            data["ingredient_id"]: data["amount"] for data in ingredients
+        }
+        removed = [
+            item.id
+            for ingredient_id, item in current.items()
+            if ingredient_id not in amounts
+        ]
+        if removed:
+            IngredientRecipe.objects.filter(id__in=removed).delete()
+        changed = []
+        added = []
+        for ingredient_id, amount in amounts.items():
+            item = current.get(ingredient_id)
+            if item is None:
+                added.append(
+                    IngredientRecipe(
+                        recipe=recipe,
+                        ingredient_id=ingredient_id,
+                        amount=amount,
+                    )
+                )
+            elif item.amount != amount:
+                item.amount = amount
+                changed.append(item)
+        if changed:
+            IngredientRecipe.objects.bulk_update(changed, ["amount"])
+        if added:
+            IngredientRecipe.objects.bulk_create(added)
+
+    @transaction.atomic
     def update(self, instance, validated_data):
-        instance.tags.clear()
-        IngredientRecipe.objects.filter(recipe=instance).delete()
-        instance.tags.set(validated_data.pop("tags"))
-        ingredients = validated_data.pop("ingredients")
-        self.create_ingredients(instance, ingredients)
+        tags = validated_data.pop("tags", None)
+        ingredients = validated_data.pop("ingredients", None)
+        if tags is not None:
+            self.update_tags(instance, tags)
+        if ingredients is not None:
+            self.update_ingredients(instance, ingredients)
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
-        return ShowRecipeSerializer(
-            instance, context={"request": self.context.get("request")}
-        ).data
+        return ShowRecipeSerializer(instance, context=self.context).data
 
 
 class DemoRecipeSerializer(serializers.ModelSerializer):
@@ -240,28 +306,24 @@ class DemoRecipeSerializer(serializers.ModelSerializer):
 class FavoritesCartBasicSerializer(serializers.ModelSerializer):
     """Сериализатор списка покупок и избранного."""
 
+    user = serializers.HiddenField(default=serializers.CurrentUserDefault())
+
     def to_representation(self, instance):
         return DemoRecipeSerializer(
             instance.recipe, context={"request": self.context.get("request")}
         ).data
 
-    def validate(self, data):
-        request = self.context.get("request")
-        if not request or request.user.is_anonymous:
-            return False
-        recipe = data["recipe"]
-        if self.model.objects.filter(
-            user=request.user, recipe=recipe
-        ).exists():
-            raise serializers.ValidationError({"status": "Уже существует"})
-        return data
+    def create(self, validated_data):
+        model = self.Meta.model
+        model.objects.bulk_create(
+            [model(**validated_data)], ignore_conflicts=True
+        )
+        return model(**validated_data)
 
 
 class FavoriteSerializer(FavoritesCartBasicSerializer):
     """Сериализатор избранного."""
 
-    model = Favorite
-
     class Meta:
         model = Favorite
         fields = (
@@ -273,11 +335,30 @@ class FavoriteSerializer(FavoritesCartBasicSerializer):
 class ShoppingCartSerializer(FavoritesCartBasicSerializer):
     """Сериализатор списка покупок."""
 
-    model = ShoppingCart
-
     class Meta:
         model = ShoppingCart
         fields = (
             "user",
             "recipe",
         )
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Сериализатор списка id рецептов для массовых операций."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100,
+    )
+
+
+class ExistingRecipesSerializer(RecipeIdsSerializer):
+    """Сериализатор списка существующих рецептов."""
+
+    def validate_recipes(self, value):
+        recipes = Recipe.objects.in_bulk(value)
+        missing = sorted(set(value) - recipes.keys())
+        if missing:
+            raise ValidationError(f"Рецепты не найдены: {missing}")
+        return list(recipes.values())
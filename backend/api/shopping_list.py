@@ -0,0 +1,136 @@
+import csv
+import hashlib
+import os
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.utils.http import quote_etag
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from recipes.models import IngredientRecipe
+
+FONT_NAME = "FreeSans"
+FONT_PATH = os.path.join(settings.BASE_DIR, "fonts", "FreeSans.ttf")
+TITLE = "Список покупок"
+TITLE_FONT_SIZE = 20
+LINE_FONT_SIZE = 16
+LINE_HEIGHT = 25
+FIRST_LINE_Y = 700
+TOP_LINE_Y = 800
+BOTTOM_MARGIN = 50
+SPOOL_MAX_SIZE = 1024 * 1024
+CSV_HEADER = ("Ингредиент", "Количество", "Единица измерения")
+
+
+def register_fonts():
+    """Регистрирует шрифт с кириллицей, один раз при запуске приложения."""
+    pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_PATH))
+
+
+def get_shopping_list(user):
+    """Суммарные количества ингредиентов из списка покупок пользователя."""
+    return (
+        IngredientRecipe.objects.filter(recipe__shopping_list__user=user)
+        .values("ingredient__name", "ingredient__measurement_unit")
+        .annotate(total_amount=Sum("amount"))
+        .order_by("ingredient__name", "ingredient__measurement_unit")
+    )
+
+
+def format_line(number, item):
+    return (
+        f"{number}. {item['ingredient__name']} - {item['total_amount']} "
+        f"{item['ingredient__measurement_unit']}"
+    )
+
+
+class Echo:
+    """Псевдобуфер: csv.writer возвращает строку вместо записи в файл."""
+
+    def write(self, value):
+        return value
+
+
+def iter_text(items):
+    yield f"{TITLE}\n\n"
+    for number, item in enumerate(items, 1):
+        yield f"{format_line(number, item)}\n"
+
+
+def iter_csv(items):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for item in items:
+        yield writer.writerow(
+            (
+                item["ingredient__name"],
+                item["total_amount"],
+                item["ingredient__measurement_unit"],
+            )
+        )
+
+
+TEXT_EXPORTS = {
+    "txt": iter_text,
+    "csv": iter_csv,
+}
+
+
+def render_pdf(items, file):
+    """Пишет список покупок в PDF, перенося строки на новые страницы."""
+    page = canvas.Canvas(file)
+    page.setFont(FONT_NAME, TITLE_FONT_SIZE)
+    page.drawString(200, TOP_LINE_Y, TITLE)
+    page.setFont(FONT_NAME, LINE_FONT_SIZE)
+    height = FIRST_LINE_Y
+    for number, item in enumerate(items, 1):
+        if height < BOTTOM_MARGIN:
+            page.showPage()
+            page.setFont(FONT_NAME, LINE_FONT_SIZE)
+            height = TOP_LINE_Y
+        page.drawString(75, height, format_line(number, item))
+        height -= LINE_HEIGHT
+    page.showPage()
+    page.save()
+
+
+def create_pdf_file(items):
+    """PDF во временном файле, который уходит на диск при большом объёме."""
+    file = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    render_pdf(items, file)
+    file.seek(0)
+    return file
+
+
+def get_shopping_list_etag(items):
+    """ETag по содержимому списка покупок."""
+    content = "\n".join(
+        "\t".join(
+            (
+                item["ingredient__name"],
+                item["ingredient__measurement_unit"],
+                str(item["total_amount"]),
+            )
+        )
+        for item in items
+    )
+    return quote_etag(hashlib.sha256(content.encode()).hexdigest())
+
+
+def get_pdf_file(user, items, etag):
+    """PDF из кэша по хэшу содержимого или заново отрисованный."""
+    key = f"shopping_list:{user.id}:{etag}"
+    content = cache.get(key)
+    if content is not None:
+        return BytesIO(content)
+    file = create_pdf_file(items)
+    if file.seek(0, os.SEEK_END) <= SPOOL_MAX_SIZE:
+        file.seek(0)
+        cache.set(key, file.read(), settings.SHOPPING_LIST_CACHE_TIMEOUT)
+    file.seek(0)
+    return file
@@ -0,0 +1,107 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.cache import (
+    INGREDIENT_VERSION_KEY,
+    bump_content_version,
+    reset_token,
+)
+from recipes.models import Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+# Поля пользователя, которые попадают в ответы с рецептами.
+AUTHOR_FIELDS = {"username", "email", "first_name", "last_name"}
+
+
+@receiver(post_delete, sender=Token)
+def reset_deleted_token(sender, instance, **kwargs):
+    """Выход из системы и удаление токена сбрасывают кэш."""
+    reset_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def reset_user_token(sender, instance, created, **kwargs):
+    """Смена пароля или активности пользователя сбрасывает кэш токена."""
+    if created:
+        return
+    for key in Token.objects.filter(user=instance).values_list(
+        "key", flat=True
+    ):
+        reset_token(key)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def reset_responses(sender, **kwargs):
+    """Изменение рецептов и тегов сбрасывает кэш анонимных ответов."""
+    transaction.on_commit(bump_content_version)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def touch_recipe_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    """Изменение набора тегов обновляет дату изменения рецептов."""
+    if action in ("post_add", "post_remove"):
+        recipes = (
+            Recipe.objects.filter(pk__in=pk_set)
+            if reverse
+            else Recipe.objects.filter(pk=instance.pk)
+        )
+    elif action == "pre_clear":
+        recipes = (
+            instance.recipes.all()
+            if reverse
+            else Recipe.objects.filter(pk=instance.pk)
+        )
+    else:
+        return
+    recipes.touch()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def touch_tag_recipes(sender, instance, created=False, **kwargs):
+    """Изменение или удаление тега обновляет дату изменения рецептов."""
+    if not created:
+        Recipe.objects.filter(tags=instance).touch()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def touch_ingredient_recipes(sender, instance, created=False, **kwargs):
+    """Изменение или удаление ингредиента обновляет дату изменения рецептов."""
+    if not created:
+        Recipe.objects.filter(ingredients=instance).touch()
+
+
+@receiver(post_save, sender=User)
+def touch_author_recipes(sender, instance, created, update_fields, **kwargs):
+    """Изменение данных автора обновляет дату изменения его рецептов."""
+    if created or (
+        update_fields is not None and not AUTHOR_FIELDS & update_fields
+    ):
+        return
+    if Recipe.objects.filter(author=instance).touch():
+        transaction.on_commit(bump_content_version)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def reset_ingredient_index(sender, **kwargs):
+    """Изменение каталога перестраивает индексы ингредиентов воркеров."""
+    transaction.on_commit(
+        lambda: bump_content_version(INGREDIENT_VERSION_KEY)
+    )
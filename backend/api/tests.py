@@ -0,0 +1,551 @@
+import threading
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.cache import get_token_key
+from api.ingredients import IngredientIndex
+from api.metrics import registry
+from api.serializers import CreateRecipeSerializer
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    ShoppingCart,
+    Tag,
+)
+from recipes.search import repair_sqlite_search
+from users.models import Follow, User
+
+RECIPES_URL = "/api/recipes/"
+
+
+class ApiTestCase(TestCase):
+    """Общие данные для тестов API."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username="author",
+            email="author@example.com",
+            first_name="Автор",
+            last_name="Рецептов",
+            password="Secret-pass-123",
+        )
+        cls.reader = User.objects.create_user(
+            username="reader",
+            email="reader@example.com",
+            first_name="Читатель",
+            last_name="Рецептов",
+            password="Secret-pass-123",
+        )
+        cls.tags = Tag.objects.bulk_create(
+            Tag(name=f"Тег {i}", color=f"#00000{i}", slug=f"tag{i}")
+            for i in range(3)
+        )
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f"Ингредиент {i}", measurement_unit="г")
+            for i in range(5)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = APIClient()
+        self.reader_client.force_authenticate(self.reader)
+        self.author_client = APIClient()
+        self.author_client.force_authenticate(self.author)
+
+    @classmethod
+    def create_recipes(cls, count, author=None):
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                author=author or cls.author,
+                name=f"Рецепт {i}",
+                text="Описание",
+                cooking_time=10,
+                image="recipes/image/recipe.png",
+            )
+            for i in range(count)
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for recipe in recipes
+            for tag in cls.tags[:2]
+        )
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(recipe=recipe, ingredient=ingredient, amount=2)
+            for recipe in recipes
+            for ingredient in cls.ingredients[:3]
+        )
+        return recipes
+
+
+class RecipeListQueriesTest(ApiTestCase):
+    """Число запросов списка рецептов не зависит от размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.create_recipes(100)
+
+    def assert_list_queries(self, client, expected):
+        for limit in (6, 20, 100):
+            with self.subTest(limit=limit):
+                cache.clear()
+                with self.assertNumQueries(expected):
+                    response = client.get(RECIPES_URL, {"limit": limit})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data["results"]), limit)
+
+    def test_anonymous(self):
+        self.assert_list_queries(self.client, 5)
+
+    def test_authenticated(self):
+        self.assert_list_queries(self.reader_client, 8)
+
+    def test_author_is_subscribed_from_cache(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.reader_client.get(RECIPES_URL)
+        self.assertTrue(response.data["results"][0]["author"]["is_subscribed"])
+        response = self.client.get(RECIPES_URL)
+        self.assertFalse(
+            response.data["results"][0]["author"]["is_subscribed"]
+        )
+
+
+class ShoppingCartDownloadTest(ApiTestCase):
+    """Ошибки выгрузки списка покупок приходят в JSON."""
+
+    url = "/api/recipes/download_shopping_cart/"
+
+    def test_unauthorized_error_is_json(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertIn("detail", response.json())
+
+    def test_unknown_format_error_is_json(self):
+        response = self.reader_client.get(self.url, {"format": "json"})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response["Content-Type"], "application/json")
+
+    def test_text_download(self):
+        response = self.reader_client.get(self.url, {"format": "txt"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+
+
+class FavoriteConcurrencyTest(TransactionTestCase):
+    """Параллельные добавления в избранное и список покупок."""
+
+    threads = 8
+
+    def setUp(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest(
+                "Нужна база, доступная из нескольких соединений: "
+                "задайте DB_TEST_NAME для SQLite."
+            )
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="reader",
+            email="reader@example.com",
+            first_name="Читатель",
+            last_name="Рецептов",
+            password="Secret-pass-123",
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.user,
+            name="Рецепт",
+            text="Описание",
+            cooking_time=10,
+            image="recipes/image/recipe.png",
+        )
+
+    def post_in_threads(self, url):
+        barrier = threading.Barrier(self.threads)
+        statuses = []
+
+        def post():
+            client = APIClient()
+            client.force_authenticate(self.user)
+            barrier.wait()
+            try:
+                statuses.append(client.post(url).status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=post) for _ in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return statuses
+
+    def test_parallel_add_and_repeated_delete(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for name, model in (
+            ("favorite", Favorite),
+            ("shopping_cart", ShoppingCart),
+        ):
+            with self.subTest(name=name):
+                url = f"{RECIPES_URL}{self.recipe.id}/{name}/"
+                statuses = self.post_in_threads(url)
+                self.assertEqual(statuses, [201] * self.threads)
+                self.assertEqual(
+                    model.objects.filter(
+                        user=self.user, recipe=self.recipe
+                    ).count(),
+                    1,
+                )
+                self.assertEqual(client.delete(url).status_code, 204)
+                self.assertEqual(client.delete(url).status_code, 400)
+
+
+class SubscriptionsQueriesTest(ApiTestCase):
+    """Подписки выбираются тремя запросами с ограничением рецептов в SQL."""
+
+    url = "/api/users/subscriptions/"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for i in range(3):
+            author = User.objects.create_user(
+                username=f"followed{i}",
+                email=f"followed{i}@example.com",
+                first_name="Автор",
+                last_name="Подписки",
+                password="Secret-pass-123",
+            )
+            cls.create_recipes(5, author=author)
+            Follow.objects.create(user=cls.reader, author=author)
+
+    def test_recipes_limit(self):
+        for limit in (1, 2, 10):
+            with self.subTest(limit=limit):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.reader_client.get(
+                        self.url, {"recipes_limit": limit}
+                    )
+                self.assertEqual(len(queries), 3)
+                self.assertIn("ROW_NUMBER", queries[-1]["sql"])
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data["results"]), 3)
+                for author in response.data["results"]:
+                    self.assertEqual(len(author["recipes"]), min(limit, 5))
+
+
+class RecipeUpdateQueriesTest(ApiTestCase):
+    """Частичное обновление рецепта трогает только изменённые строки."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.recipe = cls.create_recipes(1)[0]
+        cls.amounts = [
+            {"id": ingredient.id, "amount": 2}
+            for ingredient in cls.ingredients[:3]
+        ]
+
+    def assert_update_queries(self, data, expected):
+        serializer = CreateRecipeSerializer(
+            self.recipe, data=data, partial=True
+        )
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        # Точка сохранения транзакции добавляет SAVEPOINT и RELEASE.
+        with self.assertNumQueries(expected):
+            serializer.save()
+
+    def test_text_only(self):
+        self.assert_update_queries({"text": "Новое описание"}, 3)
+
+    def test_same_ingredients(self):
+        self.assert_update_queries({"ingredients": self.amounts}, 4)
+
+    def test_changed_amount(self):
+        amounts = [{**self.amounts[0], "amount": 5}, *self.amounts[1:]]
+        self.assert_update_queries({"ingredients": amounts}, 5)
+        self.assertEqual(
+            IngredientRecipe.objects.get(
+                recipe=self.recipe, ingredient=self.ingredients[0]
+            ).amount,
+            5,
+        )
+
+    def test_added_ingredient(self):
+        amounts = [*self.amounts, {"id": self.ingredients[3].id, "amount": 1}]
+        self.assert_update_queries({"ingredients": amounts}, 5)
+        self.assertEqual(self.recipe.ingredient_amount.count(), 4)
+
+    def test_removed_ingredient(self):
+        self.assert_update_queries({"ingredients": self.amounts[:2]}, 5)
+        self.assertEqual(self.recipe.ingredient_amount.count(), 2)
+
+
+class RecipeConditionalTest(ApiTestCase):
+    """ETag меняется вместе с данными, попадающими в ответ."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.recipe = cls.create_recipes(1)[0]
+        cls.detail_url = f"{RECIPES_URL}{cls.recipe.id}/"
+
+    def get_etag(self, url):
+        cache.clear()
+        return self.client.get(url)["ETag"]
+
+    def test_last_modified_only_on_detail(self):
+        self.assertNotIn("Last-Modified", self.client.get(RECIPES_URL))
+        self.assertIn("Last-Modified", self.client.get(self.detail_url))
+
+    def test_ingredient_change(self):
+        etag = self.get_etag(self.detail_url)
+        ingredient = self.ingredients[0]
+        ingredient.name = "Новое название"
+        ingredient.save()
+        self.assertNotEqual(self.get_etag(self.detail_url), etag)
+
+    def test_author_change(self):
+        etag = self.get_etag(RECIPES_URL)
+        self.author.first_name = "Другое имя"
+        self.author.save(update_fields=["first_name"])
+        self.assertNotEqual(self.get_etag(RECIPES_URL), etag)
+
+    def test_last_login_keeps_etag(self):
+        etag = self.get_etag(RECIPES_URL)
+        self.author.save(update_fields=["last_login"])
+        self.assertEqual(self.get_etag(RECIPES_URL), etag)
+
+
+class IngredientIndexTest(ApiTestCase):
+    """Индекс ингредиентов перестраивается по истечении срока."""
+
+    def test_rebuild_without_version_change(self):
+        index = IngredientIndex()
+        self.assertEqual(len(index.search("ингредиент", 10)), 5)
+        # bulk_create не отправляет сигналы, версия каталога не меняется.
+        Ingredient.objects.bulk_create(
+            [Ingredient(name="Ингредиент 5", measurement_unit="г")]
+        )
+        self.assertEqual(len(index.search("ингредиент", 10)), 5)
+        with override_settings(INGREDIENT_INDEX_TIMEOUT=0):
+            self.assertEqual(len(index.search("ингредиент", 10)), 6)
+
+
+class TokenCacheTest(ApiTestCase):
+    """Кэш токенов сбрасывается и не затирает счётчики пользователя."""
+
+    me_url = "/api/users/me/"
+
+    def setUp(self):
+        super().setUp()
+        self.token = Token.objects.create(user=self.reader)
+        self.token_client = APIClient()
+        self.token_client.credentials(
+            HTTP_AUTHORIZATION=f"Token {self.token.key}"
+        )
+        self.cache_key = get_token_key(self.token.key)
+        self.assertEqual(self.token_client.get(self.me_url).status_code, 200)
+        self.assertIsNotNone(cache.get(self.cache_key))
+
+    def set_password(self):
+        return self.token_client.post(
+            "/api/users/set_password/",
+            {
+                "current_password": "Secret-pass-123",
+                "new_password": "Another-pass-456",
+            },
+        )
+
+    def test_cache_has_no_secrets(self):
+        values = cache.get(self.cache_key)
+        self.assertNotIn(self.reader.password, values)
+        self.assertNotIn(self.token.key, values)
+
+    def test_logout(self):
+        response = self.token_client.post("/api/auth/token/logout/")
+        self.assertEqual(response.status_code, 204)
+        self.assertIsNone(cache.get(self.cache_key))
+        self.assertEqual(self.token_client.get(self.me_url).status_code, 401)
+
+    def test_password_change(self):
+        self.assertEqual(self.set_password().status_code, 204)
+        self.assertIsNone(cache.get(self.cache_key))
+        self.reader.refresh_from_db()
+        self.assertTrue(self.reader.check_password("Another-pass-456"))
+
+    def test_deactivation(self):
+        self.reader.is_active = False
+        self.reader.save()
+        self.assertIsNone(cache.get(self.cache_key))
+        self.assertEqual(self.token_client.get(self.me_url).status_code, 401)
+
+    def test_counters_survive_set_password(self):
+        User.objects.filter(pk=self.reader.pk).update(
+            recipes_count=6, followers_count=3
+        )
+        self.assertEqual(self.set_password().status_code, 204)
+        self.reader.refresh_from_db()
+        self.assertEqual(self.reader.recipes_count, 6)
+        self.assertEqual(self.reader.followers_count, 3)
+
+
+class CounterDriftTest(ApiTestCase):
+    """Разошедшиеся счётчики не уходят ниже нуля."""
+
+    def test_recipe_delete(self):
+        recipe = self.create_recipes(1)[0]
+        response = self.author_client.delete(f"{RECIPES_URL}{recipe.id}/")
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Recipe.objects.filter(pk=recipe.pk).exists())
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 0)
+
+    def test_unsubscribe(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.reader_client.delete(
+            f"/api/users/{self.author.id}/subscribe/"
+        )
+        self.assertEqual(response.status_code, 204)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 0)
+
+
+class RecipeSearchTest(ApiTestCase):
+    """Полнотекстовый поиск рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.borscht, cls.soup, cls.porridge = (
+            Recipe.objects.create(
+                author=author,
+                name=name,
+                text=text,
+                cooking_time=10,
+                image="recipes/image/recipe.png",
+            )
+            for author, name, text in (
+                (cls.author, "Борщ украинский", "Свёкла и капуста"),
+                (cls.reader, "Суп", "Похож на борщ, но без свёклы"),
+                (cls.author, "Каша", "Овсянка на молоке"),
+            )
+        )
+        cls.borscht.tags.add(cls.tags[0])
+        cls.soup.tags.add(cls.tags[1])
+
+    def search(self, **params):
+        response = self.client.get(RECIPES_URL, params)
+        self.assertEqual(response.status_code, 200)
+        return [recipe["id"] for recipe in response.data["results"]]
+
+    def test_name_ranks_above_text(self):
+        self.assertEqual(
+            self.search(search="борщ"), [self.borscht.id, self.soup.id]
+        )
+
+    @skipUnless(connection.vendor == "sqlite", "Префиксы ищет FTS5")
+    def test_prefix(self):
+        self.assertEqual(
+            self.search(search="бор"), [self.borscht.id, self.soup.id]
+        )
+        self.assertEqual(self.search(search="овся"), [self.porridge.id])
+
+    def test_with_tags_and_author(self):
+        self.assertEqual(
+            self.search(search="борщ", tags=self.tags[1].slug),
+            [self.soup.id],
+        )
+        self.assertEqual(
+            self.search(search="борщ", author=self.author.id),
+            [self.borscht.id],
+        )
+
+    def test_index_follows_update_and_delete(self):
+        self.porridge.name = "Борщ зелёный"
+        self.porridge.save()
+        self.assertIn(self.porridge.id, self.search(search="зелёный"))
+        self.borscht.delete()
+        self.assertEqual(self.search(search="украинский"), [])
+
+    @skipUnless(connection.vendor == "sqlite", "Триггеры FTS5 есть в SQLite")
+    def test_repair_dropped_trigger(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER recipes_recipe_fts_update")
+        Recipe.objects.filter(pk=self.porridge.pk).update(name="Рассольник")
+        self.assertEqual(self.search(search="рассольник"), [])
+        repair_sqlite_search(sender=None, using="default")
+        cache.clear()
+        self.assertEqual(self.search(search="рассольник"), [self.porridge.id])
+        self.porridge.name = "Солянка"
+        self.porridge.save()
+        self.assertEqual(self.search(search="солянка"), [self.porridge.id])
+
+
+class AnonymousCacheTest(ApiTestCase):
+    """Кэш ответов анонимным пользователям и его сброс сигналами."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.recipe = cls.create_recipes(1)[0]
+        cls.detail_url = f"{RECIPES_URL}{cls.recipe.id}/"
+
+    def get_cache_counts(self):
+        counts = {
+            (view, result): count
+            for view, result, count in registry.snapshot()["cache"]
+        }
+        return (
+            counts.get(("RecipeViewSet", "hit"), 0),
+            counts.get(("RecipeViewSet", "miss"), 0),
+        )
+
+    def get_recipe(self):
+        return self.client.get(self.detail_url).data
+
+    def test_hit_after_miss(self):
+        hits, misses = self.get_cache_counts()
+        with self.assertNumQueries(5):
+            first = self.client.get(RECIPES_URL)
+        self.assertEqual(self.get_cache_counts(), (hits, misses + 1))
+        with self.assertNumQueries(0):
+            second = self.client.get(RECIPES_URL)
+        self.assertEqual(self.get_cache_counts(), (hits + 1, misses + 1))
+        self.assertEqual(second.data, first.data)
+
+    def test_authenticated_bypass(self):
+        counts = self.get_cache_counts()
+        self.reader_client.get(RECIPES_URL)
+        self.assertEqual(self.get_cache_counts(), counts)
+
+    def test_recipe_save(self):
+        self.get_recipe()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.name = "Новое название"
+            self.recipe.save()
+        self.assertEqual(self.get_recipe()["name"], "Новое название")
+
+    def test_tags_change(self):
+        self.get_recipe()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.tags.add(self.tags[2])
+        self.assertEqual(len(self.get_recipe()["tags"]), 3)
+
+    def test_author_rename(self):
+        self.get_recipe()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.first_name = "Другое имя"
+            self.author.save(update_fields=["first_name"])
+        self.assertEqual(
+            self.get_recipe()["author"]["first_name"], "Другое имя"
+        )
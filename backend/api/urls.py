@@ -21,6 +21,18 @@ router.register("users", UserViewSet, basename="users")
 
 
 urlpatterns = [
+    path(
+        "recipes/favorite/",
+        FavoriteViewSet.as_view(
+            {"post": "create_many", "delete": "delete_many"}
+        ),
+    ),
+    path(
+        "recipes/shopping_cart/",
+        ShoppingCartViewSet.as_view(
+            {"post": "create_many", "delete": "delete_many"}
+        ),
+    ),
     path("", include(router.urls)),
     path("", include("djoser.urls")),
     path("auth/", include("djoser.urls.authtoken")),
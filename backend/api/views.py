@@ -1,14 +1,33 @@
-from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Exists, OuterRef
-from django.http.response import HttpResponse
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (
+    Count,
+    Exists,
+    F,
+    Max,
+    OuterRef,
+    Prefetch,
+    Value,
+    Window,
+)
+from django.db.models.functions import Greatest, RowNumber
+from django.http.response import (
+    FileResponse,
+    HttpResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    quote_etag,
+)
+from django.utils.http import http_date
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-
-from io import BytesIO
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import (
@@ -16,23 +35,55 @@ from rest_framework.permissions import (
     IsAuthenticated,
     IsAuthenticatedOrReadOnly,
 )
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
-from api.filters import CustomIngredientFilter, CustomRecipeFilter
-from api.pagination import CustomPaginator
+from api.cache import (
+    get_author_ids,
+    get_recipe_ids,
+    get_response_key,
+    reset_author_ids,
+    reset_recipe_ids,
+)
+from api.feed import backfill_feed, fan_out_recipe, prune_feed
+from api.filters import CustomRecipeFilter
+from api.ingredients import ingredient_index
+from api.metrics import render_metrics
+from api.mixins import AnonymousCacheMixin
+from api.pagination import (
+    CustomPaginator,
+    FeedCursorPaginator,
+    RecipeCursorPaginator,
+)
 from api.permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly
+from api.renderers import (
+    CSVRenderer,
+    FormatContentNegotiation,
+    PDFRenderer,
+    PlainTextRenderer,
+)
 from api.serializers import (
     CreateRecipeSerializer,
+    DemoRecipeSerializer,
+    ExistingRecipesSerializer,
     FavoriteSerializer,
     IngredientSerializer,
+    RecipeIdsSerializer,
     ShoppingCartSerializer,
     ShowRecipeSerializer,
     ShowSubscriptionsSerializer,
     TagSerializer,
     UserSerializer,
 )
+from api.shopping_list import (
+    TEXT_EXPORTS,
+    get_pdf_file,
+    get_shopping_list,
+    get_shopping_list_etag,
+)
 from recipes.models import (
     Favorite,
+    FeedEntry,
     Ingredient,
     IngredientRecipe,
     Recipe,
@@ -50,7 +101,9 @@ class UserViewSet(UserViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        user = get_object_or_404(User, id=self.request.user.id)
+        user = self.request.user
+        if user.is_anonymous:
+            return User.objects.annotate(is_subscribed=Value(False))
         is_subscribed = Follow.objects.filter(user=user, author=OuterRef("id"))
         return User.objects.annotate(is_subscribed=Exists(is_subscribed))
 
@@ -65,19 +118,44 @@ class UserViewSet(UserViewSet):
                 author, data=request.data, context={"request": request}
             )
             serializer.is_valid(raise_exception=True)
-            Follow.objects.create(user=user, author=author)
+            with transaction.atomic():
+                Follow.objects.create(user=user, author=author)
+                User.objects.filter(pk=author.pk).update(
+                    followers_count=F("followers_count") + 1
+                )
+                backfill_feed(user, author)
+            reset_author_ids(Follow, user)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         if request.method == "DELETE":
             subscription = get_object_or_404(Follow, user=user, author=author)
-            subscription.delete()
+            with transaction.atomic():
+                subscription.delete()
+                User.objects.filter(pk=author.pk).update(
+                    followers_count=Greatest(F("followers_count") - 1, 0)
+                )
+                prune_feed(user, author)
+            reset_author_ids(Follow, user)
             return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=False)
     def subscriptions(self, request):
-        user = request.user
-        queryset = User.objects.filter(following__user=user).prefetch_related(
-            "recipes"
+        recipes = Recipe.objects.only(
+            "id", "author", "name", "image", "cooking_time", "pub_date"
+        )
+        recipes_limit = request.query_params.get("recipes_limit", "")
+        if recipes_limit.isdigit():
+            recipes = recipes.alias(
+                row_number=Window(
+                    RowNumber(),
+                    partition_by=F("author"),
+                    order_by=(F("pub_date").desc(), F("id").desc()),
+                )
+            ).filter(row_number__lte=int(recipes_limit))
+        queryset = (
+            User.objects.filter(following__user=request.user)
+            .annotate(is_subscribed=Value(True))
+            .prefetch_related(Prefetch("recipes", queryset=recipes))
         )
         pages = self.paginate_queryset(queryset)
         serializer = ShowSubscriptionsSerializer(
@@ -86,7 +164,7 @@ class UserViewSet(UserViewSet):
         return self.get_paginated_response(serializer.data)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(AnonymousCacheMixin, viewsets.ModelViewSet):
     """Вьюсет модели Recipe."""
 
     serializer_class = CreateRecipeSerializer
@@ -95,101 +173,201 @@ class RecipeViewSet(viewsets.ModelViewSet):
         IsAuthorOrReadOnly or IsAdminOrReadOnly,
     ]
     pagination_class = CustomPaginator
+    cursor_pagination_class = RecipeCursorPaginator
     filter_backends = [
         DjangoFilterBackend,
     ]
     filterset_class = CustomRecipeFilter
 
+    @property
+    def paginator(self):
+        """Курсорная пагинация включается параметром cursor."""
+        if not hasattr(self, "_paginator"):
+            if "cursor" in self.request.query_params:
+                self._paginator = self.cursor_pagination_class()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
     def get_queryset(self):
+        if self.action in ("list", "retrieve"):
+            return self.get_read_queryset()
+        return Recipe.objects.all()
+
+    def list(self, request, *args, **kwargs):
+        # Курсорная пагинация не считает COUNT, ETag её не замедляет.
+        if "cursor" in request.query_params:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(Recipe.objects.all())
+        return self.get_conditional_response(
+            queryset, super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        if not str(kwargs.get("pk", "")).isdigit():
+            return super().retrieve(request, *args, **kwargs)
+        queryset = Recipe.objects.filter(pk=kwargs["pk"])
+        return self.get_conditional_response(
+            queryset, super().retrieve, request, *args, **kwargs
+        )
+
+    def get_conditional_response(
+        self, queryset, handler, request, *args, **kwargs
+    ):
+        """Ответ 304 без сериализации, если рецепты не изменились."""
+        state = self.get_state(queryset)
+        if not state["count"]:
+            return handler(request, *args, **kwargs)
+        etag = self.get_etag(state)
+        # Избранное и подписки не меняют updated_at, поэтому для
+        # пользователей проверка идёт только по ETag. У списка максимум
+        # updated_at не растёт при удалении рецепта из выборки.
+        last_modified = None
+        if request.user.is_anonymous and self.action == "retrieve":
+            last_modified = int(state["last_modified"].timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def get_state(self, queryset):
+        """Число рецептов и дата последнего изменения выборки."""
+
+        # Состояние кэшируется с версией контента, которая меняется
+        # вместе с updated_at. Фильтры могут зависеть от пользователя.
+        return cache.get_or_set(
+            f"{get_response_key(self.request)}:state:{self.request.user.pk}",
+            lambda: queryset.aggregate(
+                count=Count("id"), last_modified=Max("updated_at")
+            ),
+            settings.RESPONSE_CACHE_TIMEOUT,
+        )
+
+    def get_etag(self, state):
+        parts = [state["count"], state["last_modified"].isoformat()]
         user = self.request.user
-        if not user.is_anonymous:
-            is_favorited = Favorite.objects.filter(
-                user=user,
-                recipe=OuterRef('id')
-            )
-            is_in_shopping_cart = ShoppingCart.objects.filter(
-                user=user,
-                recipe=OuterRef('id')
-            )
-            return Recipe.objects.prefetch_related('ingredients').annotate(
-                is_favorited=Exists(is_favorited),
-                is_in_shopping_cart=Exists(is_in_shopping_cart)
+        if user.is_authenticated:
+            parts += [
+                user.id,
+                sorted(get_recipe_ids(Favorite, user)),
+                sorted(get_recipe_ids(ShoppingCart, user)),
+                sorted(get_author_ids(Follow, user)),
+            ]
+        return quote_etag(hashlib.sha256(repr(parts).encode()).hexdigest())
+
+    def get_read_queryset(self):
+        """Выборка рецептов для чтения, не зависящая от пользователя."""
+        return Recipe.objects.select_related("author").prefetch_related(
+            "tags",
+            Prefetch(
+                "ingredient_amount",
+                queryset=IngredientRecipe.objects.select_related(
+                    "ingredient"
+                ),
+            ),
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        user = self.request.user
+        if user.is_authenticated:
+            context["favorited_ids"] = get_recipe_ids(Favorite, user)
+            context["in_shopping_cart_ids"] = get_recipe_ids(
+                ShoppingCart, user
             )
-        return Recipe.objects.all()
+            context["subscribed_author_ids"] = get_author_ids(Follow, user)
+        return context
+
+    def handle_exception(self, exc):
+        """Ошибки выгрузки списка покупок отдаются в JSON, а не как файл."""
+        response = super().handle_exception(exc)
+        if self.action == "download_shopping_cart":
+            self.request.accepted_renderer = JSONRenderer()
+            self.request.accepted_media_type = JSONRenderer.media_type
+        return response
 
     def get_serializer_class(self):
         if self.request.method == "GET":
             return ShowRecipeSerializer
         return CreateRecipeSerializer
 
-    def generate_shopping_list_pdf(self, recipe):
-        final_list = {}
-        ingredients = IngredientRecipe.objects.filter(
-            recipe__shopping_list__user=self.request.user,
-            recipe=recipe,
-        ).values_list(
-            "ingredient__name", "ingredient__measurement_unit", "amount"
-        )
-        for item in ingredients:
-            name = item[0]
-            if name not in final_list:
-                final_list[name] = {
-                    "measurement_unit": item[1],
-                    "amount": item[2],
-                }
-            else:
-                final_list[name]["amount"] += item[2]
-        return final_list
-
-    def create_shopping_list_pdf(self, recipe):
-        final_list = self.generate_shopping_list_pdf(recipe)
-        buffer = BytesIO()
-        page = canvas.Canvas(buffer)
-        pdfmetrics.registerFont(TTFont("FreeSans", "../fonts/FreeSans.ttf"))
-        page.setFont("FreeSans", 20)
-        page.drawString(200, 800, "Список покупок")
-        page.setFont("FreeSans", 16)
-        height = 700
-        for i, (name, data) in enumerate(final_list.items(), 1):
-            page.drawString(
-                75,
-                height,
-                (
-                    f"{i}. {name} - {data['amount']} "
-                    f"{data['measurement_unit']}"
-                ),
-            )
-            height -= 25
-        page.showPage()
-        page.save()
-        buffer.seek(0)
-        return buffer
+    @transaction.atomic
+    def perform_create(self, serializer):
+        recipe = serializer.save()
+        User.objects.filter(pk=self.request.user.pk).update(
+            recipes_count=F("recipes_count") + 1
+        )
+        fan_out_recipe(recipe)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
+        # Счётчик мог разойтись с данными, например после правок в
+        # админке: уход ниже нуля нарушил бы ограничение поля.
+        User.objects.filter(pk=instance.author_id).update(
+            recipes_count=Greatest(F("recipes_count") - 1, 0)
+        )
+
+    @action(detail=False, permission_classes=[IsAuthenticated])
+    def feed(self, request):
+        paginator = FeedCursorPaginator()
+        entries = paginator.paginate_queryset(
+            FeedEntry.objects.filter(user=request.user).only(
+                "recipe_id", "pub_date"
+            ),
+            request,
+            view=self,
+        )
+        recipes = self.get_read_queryset().in_bulk(
+            [entry.recipe_id for entry in entries]
+        )
+        serializer = ShowRecipeSerializer(
+            [recipes[entry.recipe_id] for entry in entries],
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        return paginator.get_paginated_response(serializer.data)
 
     @action(
-        detail=False, methods=["GET"], permission_classes=[IsAuthenticated]
+        detail=False,
+        methods=["GET"],
+        permission_classes=[IsAuthenticated],
+        renderer_classes=[PDFRenderer, PlainTextRenderer, CSVRenderer],
+        content_negotiation_class=FormatContentNegotiation,
     )
     def download_shopping_cart(self, request):
-        try:
-            recipe_id = request.query_params.get("recipe_id", None)
-            if recipe_id:
-                recipe = Recipe.objects.get(pk=recipe_id)
-            else:
-                recipe = Recipe.objects.filter(author=request.user).first()
-        except ObjectDoesNotExist:
-            return HttpResponse("Recipe not found.", status=404)
-
-        buffer = self.create_shopping_list_pdf(recipe)
-
-        response = HttpResponse(
-            buffer.getvalue(), content_type="application/pdf"
-        )
-        response[
-            "Content-Disposition"
-        ] = "attachment; filename='shopping_list.pdf'"
+        export_format = request.accepted_renderer.format
+        if export_format in TEXT_EXPORTS:
+            items = get_shopping_list(request.user).iterator()
+            response = StreamingHttpResponse(
+                TEXT_EXPORTS[export_format](items),
+                content_type=f"{request.accepted_media_type}; charset=utf-8",
+            )
+            response["Content-Disposition"] = (
+                f'attachment; filename="shopping_list.{export_format}"'
+            )
+            return response
+        items = list(get_shopping_list(request.user))
+        etag = get_shopping_list_etag(items)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = FileResponse(
+                get_pdf_file(request.user, items, etag),
+                as_attachment=True,
+                filename="shopping_list.pdf",
+                content_type="application/pdf",
+            )
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
         return response
 
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(AnonymousCacheMixin, viewsets.ModelViewSet):
     """Вьюсет модели Tag."""
 
     queryset = Tag.objects.all()
@@ -203,12 +381,15 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = IngredientSerializer
     queryset = Ingredient.objects.all()
     permission_classes = [AllowAny]
-    filter_backends = [
-        CustomIngredientFilter,
-    ]
-    search_fields = [
-        "^name",
-    ]
+
+    def list(self, request, *args, **kwargs):
+        """Поиск по индексу в памяти без обращения к базе."""
+        return Response(
+            ingredient_index.search(
+                request.query_params.get("name", ""),
+                settings.INGREDIENT_SEARCH_LIMIT,
+            )
+        )
 
 
 class FavoritesShoppingCartBasicViewSet(viewsets.ModelViewSet):
@@ -217,22 +398,58 @@ class FavoritesShoppingCartBasicViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def create(self, request, *args, **kwargs):
-        data_my = {"user": request.user.id, "recipe": kwargs.get("id")}
-        serializer = self.get_serializer(data=data_my)
+        serializer = self.get_serializer(data={"recipe": kwargs.get("id")})
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        self.update_counters([kwargs.get("id")])
+        reset_recipe_ids(self.model, request.user)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-    def perform_create(self, serializer, *args, **kwargs):
-        serializer.save(serializer.validated_data)
-
     def delete(self, request, *args, **kwargs):
-        favorite = kwargs.get("id")
+        deleted, _ = self.model.objects.filter(
+            user=request.user, recipe=kwargs.get("id")
+        ).delete()
+        if not deleted:
+            return Response(
+                {"status": "Не существует"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        self.update_counters([kwargs.get("id")])
+        reset_recipe_ids(self.model, request.user)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def create_many(self, request, *args, **kwargs):
+        serializer = ExistingRecipesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipes = serializer.validated_data["recipes"]
+        self.model.objects.bulk_create(
+            [
+                self.model(user=request.user, recipe=recipe)
+                for recipe in recipes
+            ],
+            ignore_conflicts=True,
+        )
+        self.update_counters([recipe.id for recipe in recipes])
+        reset_recipe_ids(self.model, request.user)
+        serializer = DemoRecipeSerializer(
+            recipes, many=True, context={"request": request}
+        )
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def delete_many(self, request, *args, **kwargs):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data["recipes"]
         self.model.objects.filter(
-            user=request.user.id, recipe=favorite
+            user=request.user, recipe__in=recipe_ids
         ).delete()
+        self.update_counters(recipe_ids)
+        reset_recipe_ids(self.model, request.user)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def update_counters(self, recipe_ids):
+        """Обновляет денормализованные счётчики затронутых рецептов."""
+
 
 class FavoriteViewSet(FavoritesShoppingCartBasicViewSet):
     """Вьюсет модели избранного."""
@@ -241,6 +458,9 @@ class FavoriteViewSet(FavoritesShoppingCartBasicViewSet):
     serializer_class = FavoriteSerializer
     model = Favorite
 
+    def update_counters(self, recipe_ids):
+        Recipe.objects.filter(pk__in=recipe_ids).update_favorites_count()
+
 
 class ShoppingCartViewSet(FavoritesShoppingCartBasicViewSet):
     """Вьюсет списка покупок."""
@@ -248,3 +468,11 @@ class ShoppingCartViewSet(FavoritesShoppingCartBasicViewSet):
     queryset = ShoppingCart.objects.select_related("author", "recipes")
     serializer_class = ShoppingCartSerializer
     model = ShoppingCart
+
+
+def metrics(request):
+    """Метрики воркеров в текстовом формате Prometheus."""
+    return HttpResponse(
+        render_metrics(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
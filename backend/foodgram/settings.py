@@ -38,6 +38,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.middleware.MetricsMiddleware",
+    "api.middleware.SQLInstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -45,6 +47,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "api.middleware.ProfilerMiddleware",
 ]
 
 ROOT_URLCONF = "foodgram.urls"
@@ -77,9 +80,68 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD", default="postgres"),
         "HOST": os.getenv("DB_HOST", default="localhost"),
         "PORT": os.getenv("DB_PORT", default="5432"),
+        "TEST": {"NAME": os.getenv("DB_TEST_NAME")},
     }
 }
 
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND",
+            default="django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", default="foodgram"),
+    }
+}
+
+MEMBERSHIP_CACHE_TIMEOUT = 300
+
+TOKEN_CACHE_TIMEOUT = 60
+
+RESPONSE_CACHE_TIMEOUT = 60 * 10
+
+INGREDIENT_SEARCH_LIMIT = 20
+
+# Индекс перестраивается и без смены версии: с LocMemCache версия,
+# увеличенная load_data, не видна процессам сервера.
+INGREDIENT_INDEX_TIMEOUT = 60 * 5
+
+SHOPPING_LIST_CACHE_TIMEOUT = 60 * 60
+
+FEED_BATCH_SIZE = 1000
+
+FEED_BACKFILL_LIMIT = 100
+
+SLOW_REQUEST_THRESHOLD_MS = int(
+    os.getenv("SLOW_REQUEST_THRESHOLD_MS", default=500)
+)
+
+PROFILER_DIR = os.getenv("PROFILER_DIR", default="")
+
+PROFILER_SAMPLE_RATE = int(os.getenv("PROFILER_SAMPLE_RATE", default=0))
+
+METRICS_DIR = os.getenv("METRICS_DIR", default="")
+
+METRICS_FLUSH_INTERVAL = 10
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "plain": {"format": "%(asctime)s %(levelname)s %(name)s %(message)s"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "plain"},
+    },
+    "loggers": {
+        "api.slow_requests": {
+            "handlers": ["console"],
+            "level": "WARNING",
+            "propagate": False,
+        },
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -100,7 +162,7 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.AllowAny",
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "api.authentication.CachedTokenAuthentication",
     ],
 }
 
@@ -46,6 +46,7 @@ class RecipeAdmin(admin.ModelAdmin):
         "text",
         "cooking_time",
         "pub_date",
+        "favorites_count",
     )
     search_fields = (
         "name",
@@ -56,6 +57,7 @@ class RecipeAdmin(admin.ModelAdmin):
         "author",
         "tags",
     )
+    readonly_fields = ("favorites_count", "updated_at")
     empty_value_display = "-"
     inlines = (IngredientInline,)
 
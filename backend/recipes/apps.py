@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class RecipesConfig(AppConfig):
     name = "recipes"
     verbose_name = "Рецепты"
+
+    def ready(self):
+        from recipes.search import repair_sqlite_search
+
+        post_migrate.connect(repair_sqlite_search, sender=self)
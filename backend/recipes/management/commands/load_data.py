@@ -1,28 +1,105 @@
+import csv
 import json
+import time
 from pathlib import Path
 
-from django.core.exceptions import ValidationError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
+from api.cache import INGREDIENT_VERSION_KEY, bump_content_version
 from recipes.models import Ingredient
 
 current_script_path = Path(__file__).resolve().parent
 INGREDIENTS_JSON_PATH = current_script_path / "data" / "ingredients.json"
+NAME_MAX_LENGTH = Ingredient._meta.get_field("name").max_length
+UNIT_MAX_LENGTH = Ingredient._meta.get_field("measurement_unit").max_length
 
 
 class Command(BaseCommand):
     help = "Загрузка ингредиентов"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            type=Path,
+            default=INGREDIENTS_JSON_PATH,
+            help="Файл ингредиентов в формате CSV или JSON",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Количество ингредиентов в одном запросе INSERT",
+        )
+
+    @staticmethod
+    def read_rows(path):
+        with open(path, encoding="utf-8") as data_file:
+            if path.suffix == ".csv":
+                yield from csv.reader(data_file)
+            else:
+                for item in json.load(data_file):
+                    if not isinstance(item, dict):
+                        yield (item,)
+                        continue
+                    yield item.get("name"), item.get("measurement_unit")
+
+    @staticmethod
+    def is_valid(row):
+        if len(row) != 2:
+            return False
+        name, measurement_unit = row
+        return (
+            isinstance(name, str)
+            and isinstance(measurement_unit, str)
+            and 0 < len(name.strip()) <= NAME_MAX_LENGTH
+            and 0 < len(measurement_unit.strip()) <= UNIT_MAX_LENGTH
+        )
+
+    def save_batch(self, batch, batch_size):
+        Ingredient.objects.bulk_create(
+            batch, batch_size=batch_size, ignore_conflicts=True
+        )
+        bump_content_version(INGREDIENT_VERSION_KEY)
+
     def handle(self, *args, **options):
+        path = options["path"]
+        batch_size = options["batch_size"]
         self.stdout.write(self.style.WARNING("Загрузка начата"))
+        started = time.perf_counter()
+        count_before = Ingredient.objects.count()
+        processed = skipped = 0
+        batch = []
         try:
-            with open(
-                INGREDIENTS_JSON_PATH, encoding="utf-8"
-            ) as data_file_ingredients:
-                ingredient_data = json.load(data_file_ingredients)
-                for ingredients in ingredient_data:
-                    Ingredient.objects.get_or_create(**ingredients)
-        except (FileNotFoundError, json.JSONDecodeError, ValidationError) as e:
-            self.stderr.write(self.style.ERROR(f"Ошибка при загрузке: {e}"))
-
-        self.stdout.write(self.style.SUCCESS("Загрузка завершена"))
+            for line, row in enumerate(self.read_rows(path), 1):
+                if not self.is_valid(row):
+                    skipped += 1
+                    self.stderr.write(
+                        self.style.ERROR(f"Строка {line} пропущена: {row}")
+                    )
+                    continue
+                name, measurement_unit = row
+                batch.append(
+                    Ingredient(
+                        name=name.strip(),
+                        measurement_unit=measurement_unit.strip(),
+                    )
+                )
+                processed += 1
+                if len(batch) >= batch_size:
+                    self.save_batch(batch, batch_size)
+                    batch = []
+                    self.stdout.write(f"Обработано строк: {processed}")
+            if batch:
+                self.save_batch(batch, batch_size)
+        except (OSError, json.JSONDecodeError, csv.Error) as e:
+            raise CommandError(f"Ошибка при загрузке: {e}")
+
+        elapsed = time.perf_counter() - started
+        created = Ingredient.objects.count() - count_before
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Загрузка завершена: обработано {processed}, "
+                f"добавлено {created}, пропущено {skipped} "
+                f"за {elapsed:.2f} с ({processed / elapsed:.0f} строк/с)"
+            )
+        )
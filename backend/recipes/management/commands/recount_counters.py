@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe
+from users.models import Follow, User
+
+COUNTERS = (
+    (Recipe, "favorites_count", Favorite, "recipe"),
+    (User, "recipes_count", Recipe, "author"),
+    (User, "followers_count", Follow, "author"),
+)
+
+
+def count_related(model, field):
+    related = (
+        model.objects.filter(**{field: OuterRef("pk")})
+        .order_by()
+        .values(field)
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    return Coalesce(Subquery(related), 0)
+
+
+class Command(BaseCommand):
+    help = "Пересчёт счётчиков рецептов, подписчиков и избранного"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Количество строк, пересчитываемых за один запрос",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        for model, counter, related_model, field in COUNTERS:
+            repaired = 0
+            last_id = model.objects.aggregate(last_id=Max("pk"))["last_id"]
+            actual = count_related(related_model, field)
+            for start in range(0, (last_id or 0) + 1, batch_size):
+                with transaction.atomic():
+                    repaired += (
+                        model.objects.filter(
+                            pk__gte=start, pk__lt=start + batch_size
+                        )
+                        .alias(actual=actual)
+                        .exclude(**{counter: F("actual")})
+                        .update(**{counter: actual})
+                    )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{model.__name__}.{counter}: исправлено {repaired}"
+                )
+            )
@@ -0,0 +1,233 @@
+import random
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import (
+    Favorite,
+    FeedEntry,
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    ShoppingCart,
+    Tag,
+)
+from users.models import Follow, User
+
+PASSWORD = "seed_password"
+IMAGE = "recipes/image/seed.png"
+
+
+class Command(BaseCommand):
+    help = "Генерация синтетических данных для нагрузочного тестирования"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--users", type=int, default=10000)
+        parser.add_argument(
+            "--authors",
+            type=float,
+            default=0.5,
+            help="Доля пользователей, публикующих рецепты",
+        )
+        parser.add_argument("--recipes-per-author", type=int, default=10)
+        parser.add_argument("--ingredients-per-recipe", type=int, default=8)
+        parser.add_argument("--tags", type=int, default=10)
+        parser.add_argument("--tags-per-recipe", type=int, default=2)
+        parser.add_argument("--follows-per-user", type=int, default=20)
+        parser.add_argument("--favorites-per-user", type=int, default=30)
+        parser.add_argument("--cart-per-user", type=int, default=5)
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def bulk_create(self, model, objects):
+        batch = []
+        created = 0
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                model.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        if batch:
+            model.objects.bulk_create(batch)
+            created += len(batch)
+        self.stdout.write(f"{model.__name__}: {created}")
+        self.rows += created
+
+    def get_tag_ids(self, count):
+        Tag.objects.bulk_create(
+            [
+                Tag(name=f"Тег {i}", color=f"#{i:06x}", slug=f"tag-{i}")
+                for i in range(count)
+            ],
+            ignore_conflicts=True,
+        )
+        return list(Tag.objects.order_by("id").values_list("id", flat=True))
+
+    def handle(self, *args, **options):
+        self.batch_size = options["batch_size"]
+        self.rows = 0
+        rng = random.Random(options["seed"])
+        prefix = f"seed{options['seed']}_"
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f"Данные с seed={options['seed']} уже созданы, "
+                "укажите другой --seed."
+            )
+        started = time.perf_counter()
+
+        if not Ingredient.objects.exists():
+            call_command("load_data", stdout=self.stdout)
+        ingredient_ids = list(
+            Ingredient.objects.order_by("id").values_list("id", flat=True)
+        )
+        tag_ids = self.get_tag_ids(options["tags"])
+
+        users_count = options["users"]
+        authors_count = max(1, int(users_count * options["authors"]))
+        per_author = options["recipes_per_author"]
+        recipes_count = authors_count * per_author
+
+        follows = [
+            (user, author)
+            for user in range(users_count)
+            for author in rng.sample(
+                range(authors_count),
+                min(options["follows_per_user"], authors_count),
+            )
+            if author != user
+        ]
+        favorites = [
+            (user, recipe)
+            for user in range(users_count)
+            for recipe in rng.sample(
+                range(recipes_count),
+                min(options["favorites_per_user"], recipes_count),
+            )
+        ]
+        followers_count = Counter(author for _, author in follows)
+        favorites_count = Counter(recipe for _, recipe in favorites)
+
+        password = make_password(PASSWORD)
+        self.bulk_create(
+            User,
+            (
+                User(
+                    username=f"{prefix}{i}",
+                    email=f"{prefix}{i}@example.com",
+                    first_name="Имя",
+                    last_name="Фамилия",
+                    password=password,
+                    recipes_count=per_author if i < authors_count else 0,
+                    followers_count=followers_count[i],
+                )
+                for i in range(users_count)
+            ),
+        )
+        user_ids = list(
+            User.objects.filter(username__startswith=prefix)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+
+        self.bulk_create(
+            Recipe,
+            (
+                Recipe(
+                    author_id=user_ids[i // per_author],
+                    name=f"Рецепт {i}",
+                    text=f"Описание рецепта {i}. " * rng.randint(1, 20),
+                    image=IMAGE,
+                    cooking_time=rng.randint(1, 180),
+                    favorites_count=favorites_count[i],
+                )
+                for i in range(recipes_count)
+            ),
+        )
+        recipes = list(
+            Recipe.objects.filter(author_id__in=user_ids[:authors_count])
+            .order_by("id")
+            .values_list("id", "pub_date")
+        )
+        recipe_ids = [recipe_id for recipe_id, _ in recipes]
+
+        ingredients_per_recipe = min(
+            options["ingredients_per_recipe"], len(ingredient_ids)
+        )
+        self.bulk_create(
+            IngredientRecipe,
+            (
+                IngredientRecipe(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=rng.randint(1, 500),
+                )
+                for recipe_id in recipe_ids
+                for ingredient_id in rng.sample(
+                    ingredient_ids, ingredients_per_recipe
+                )
+            ),
+        )
+        self.bulk_create(
+            Recipe.tags.through,
+            (
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in recipe_ids
+                for tag_id in rng.sample(
+                    tag_ids, min(options["tags_per_recipe"], len(tag_ids))
+                )
+            ),
+        )
+        self.bulk_create(
+            Follow,
+            (
+                Follow(user_id=user_ids[user], author_id=user_ids[author])
+                for user, author in follows
+            ),
+        )
+        self.bulk_create(
+            Favorite,
+            (
+                Favorite(user_id=user_ids[user], recipe_id=recipe_ids[recipe])
+                for user, recipe in favorites
+            ),
+        )
+        self.bulk_create(
+            ShoppingCart,
+            (
+                ShoppingCart(user_id=user_id, recipe_id=recipe_id)
+                for user_id in user_ids
+                for recipe_id in rng.sample(
+                    recipe_ids, min(options["cart_per_user"], recipes_count)
+                )
+            ),
+        )
+        backfill = min(per_author, settings.FEED_BACKFILL_LIMIT)
+        latest_recipes = [
+            recipes[(author + 1) * per_author - backfill:][:backfill]
+            for author in range(authors_count)
+        ]
+        self.bulk_create(
+            FeedEntry,
+            (
+                FeedEntry(
+                    user_id=user_ids[user],
+                    recipe_id=recipe_id,
+                    pub_date=pub_date,
+                )
+                for user, author in follows
+                for recipe_id, pub_date in latest_recipes[author]
+            ),
+        )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Создано строк: {self.rows} за {elapsed:.1f} с "
+                f"({self.rows / elapsed:.0f} строк/с)"
+            )
+        )
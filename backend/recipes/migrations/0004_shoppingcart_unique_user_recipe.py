@@ -0,0 +1,48 @@
+# Generated by Django 4.2.3 on 2026-10-18 04:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_shopping_cart_rows(apps, schema_editor):
+    ShoppingCart = apps.get_model("recipes", "ShoppingCart")
+    duplicates = (
+        ShoppingCart.objects.values("user", "recipe")
+        .annotate(first_id=Min("id"), rows=Count("id"))
+        .filter(rows__gt=1)
+    )
+    for duplicate in duplicates:
+        ShoppingCart.objects.filter(
+            user=duplicate["user"], recipe=duplicate["recipe"]
+        ).exclude(id=duplicate["first_id"]).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0003_alter_recipe_ingredients"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="ingredientrecipe",
+            name="ingredient",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="ingredient_amount",
+                to="recipes.ingredient",
+                verbose_name="Ингредиент",
+            ),
+        ),
+        migrations.RunPython(
+            remove_duplicate_shopping_cart_rows,
+            migrations.RunPython.noop,
+        ),
+        migrations.AddConstraint(
+            model_name="shoppingcart",
+            constraint=models.UniqueConstraint(
+                fields=("user", "recipe"),
+                name="uq_user_recipe_shopping_cart",
+            ),
+        ),
+    ]
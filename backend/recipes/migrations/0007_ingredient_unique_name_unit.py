@@ -0,0 +1,54 @@
+# Generated by Django 4.2.3 on 2026-10-18 04:40
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model("recipes", "Ingredient")
+    IngredientRecipe = apps.get_model("recipes", "IngredientRecipe")
+    duplicates = (
+        Ingredient.objects.values("name", "measurement_unit")
+        .annotate(first_id=Min("id"), rows=Count("id"))
+        .filter(rows__gt=1)
+    )
+    for duplicate in duplicates:
+        first_id = duplicate["first_id"]
+        extra_ids = (
+            Ingredient.objects.filter(
+                name=duplicate["name"],
+                measurement_unit=duplicate["measurement_unit"],
+            )
+            .exclude(id=first_id)
+            .values_list("id", flat=True)
+        )
+        for extra_id in list(extra_ids):
+            IngredientRecipe.objects.filter(
+                ingredient_id=extra_id,
+                recipe__in=IngredientRecipe.objects.filter(
+                    ingredient_id=first_id
+                ).values("recipe"),
+            ).delete()
+            IngredientRecipe.objects.filter(ingredient_id=extra_id).update(
+                ingredient_id=first_id
+            )
+            Ingredient.objects.filter(id=extra_id).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0006_feedentry"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name="ingredient",
+            constraint=models.UniqueConstraint(
+                fields=("name", "measurement_unit"),
+                name="uq_ingredient_name_unit",
+            ),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.3 on 2026-10-18 11:40
+
+from django.db import migrations
+
+
+def create_search_vector_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS recipe_search_vector_idx "
+        "ON recipes_recipe USING GIN (search_vector)"
+    )
+
+
+def drop_search_vector_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        "DROP INDEX CONCURRENTLY IF EXISTS recipe_search_vector_idx"
+    )
+
+
+class Migration(migrations.Migration):
+    # CONCURRENTLY не блокирует запись, но не работает внутри транзакции.
+    atomic = False
+
+    dependencies = [
+        ("recipes", "0010_recipe_search"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            create_search_vector_index, drop_search_vector_index
+        ),
+    ]
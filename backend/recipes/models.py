@@ -1,6 +1,9 @@
 from colorfield.fields import ColorField
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 from users.models import User
 
@@ -37,11 +40,37 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = "Ингредиент"
         verbose_name_plural = "Ингредиенты"
+        constraints = [
+            models.UniqueConstraint(
+                fields=(
+                    "name",
+                    "measurement_unit",
+                ),
+                name="uq_ingredient_name_unit",
+            )
+        ]
 
     def __str__(self):
         return f"{self.name}, {self.measurement_unit}"[:35]
 
 
+class RecipeQuerySet(models.QuerySet):
+    def update_favorites_count(self):
+        """Пересчитывает счётчик избранного одним запросом UPDATE."""
+        favorites = (
+            Favorite.objects.filter(recipe=OuterRef("pk"))
+            .order_by()
+            .values("recipe")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        return self.update(favorites_count=Coalesce(Subquery(favorites), 0))
+
+    def touch(self):
+        """Обновляет дату изменения без сохранения моделей."""
+        return self.update(updated_at=timezone.now())
+
+
 class Recipe(models.Model):
     """Модель рецепта."""
 
@@ -76,11 +105,24 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         auto_now_add=True, verbose_name="Дата создания"
     )
+    updated_at = models.DateTimeField(
+        auto_now=True, db_index=True, verbose_name="Дата изменения"
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0, verbose_name="В избранном"
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ("-pub_date",)
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
+        indexes = [
+            models.Index(
+                fields=("-pub_date", "-id"), name="recipe_pub_date_idx"
+            )
+        ]
 
     def __str__(self):
         return self.name[:35]
@@ -179,6 +221,56 @@ class ShoppingCart(models.Model):
         verbose_name = "Список покупок"
         verbose_name_plural = "Список покупок"
         default_related_name = "shopping_list"
+        constraints = [
+            models.UniqueConstraint(
+                fields=(
+                    "user",
+                    "recipe",
+                ),
+                name="uq_user_recipe_shopping_cart",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user}, {self.recipe}"[:35]
+
+
+class FeedEntry(models.Model):
+    """Модель записи ленты подписок."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="feed",
+        verbose_name="Подписчик",
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="feed_entries",
+        verbose_name="Рецепт",
+    )
+    pub_date = models.DateTimeField(verbose_name="Дата публикации")
+
+    class Meta:
+        ordering = ("-pub_date", "-recipe")
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Лента подписок"
+        constraints = [
+            models.UniqueConstraint(
+                fields=(
+                    "user",
+                    "recipe",
+                ),
+                name="uq_feed_user_recipe",
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=("user", "-pub_date", "-recipe"),
+                name="feed_user_pub_date_idx",
+            )
+        ]
 
     def __str__(self):
         return f"{self.user}, {self.recipe}"[:35]
@@ -0,0 +1,56 @@
+from django.db import connections
+
+SQLITE_TABLE = "recipes_recipe_fts"
+
+# SQLite пересоздаёт таблицу при большинстве AlterField и RemoveField,
+# и триггеры пропадают вместе со старой таблицей. Их восстанавливает
+# repair_sqlite_search после каждой миграции.
+SQLITE_TRIGGERS = {
+    "recipes_recipe_fts_insert": """
+    CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_insert
+    AFTER INSERT ON recipes_recipe
+    BEGIN
+        INSERT INTO recipes_recipe_fts(rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+    "recipes_recipe_fts_delete": """
+    CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_delete
+    AFTER DELETE ON recipes_recipe
+    BEGIN
+        INSERT INTO recipes_recipe_fts(recipes_recipe_fts, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+    END
+    """,
+    "recipes_recipe_fts_update": """
+    CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_update
+    AFTER UPDATE OF name, text ON recipes_recipe
+    BEGIN
+        INSERT INTO recipes_recipe_fts(recipes_recipe_fts, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+        INSERT INTO recipes_recipe_fts(rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+}
+
+SQLITE_REBUILD = (
+    "INSERT INTO recipes_recipe_fts(recipes_recipe_fts) VALUES ('rebuild')"
+)
+
+
+def repair_sqlite_search(sender, using, **kwargs):
+    """Восстанавливает триггеры FTS5 и перестраивает индекс SQLite."""
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        if SQLITE_TABLE not in connection.introspection.table_names(cursor):
+            return
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        missing = SQLITE_TRIGGERS.keys() - {name for name, in cursor}
+        if not missing:
+            return
+        for name in sorted(missing):
+            cursor.execute(SQLITE_TRIGGERS[name])
+        cursor.execute(SQLITE_REBUILD)
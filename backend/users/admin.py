@@ -5,8 +5,16 @@ from .models import Follow, User
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
-    list_display = ("username", "email", "first_name", "last_name")
+    list_display = (
+        "username",
+        "email",
+        "first_name",
+        "last_name",
+        "recipes_count",
+        "followers_count",
+    )
     search_fields = ("username", "email")
+    readonly_fields = ("recipes_count", "followers_count")
     ordering = ("username",)
     empty_value_display = "-"
 
@@ -23,6 +23,12 @@ class User(AbstractUser):
     email = models.EmailField(
         max_length=254, unique=True, verbose_name="Почта"
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0, verbose_name="Количество рецептов"
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0, verbose_name="Количество подписчиков"
+    )
 
     class Meta:
         ordering = ("username",)